@@ -12,12 +12,72 @@ logger = get_logger(__name__)
 
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # point at a local fake server for load tests
 # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-DATA_FILE = "app/data/classified_sites.json"
+DATA_FILE = "app/data/classified_sites.json"   # legacy format, imported once into the JSONL store
+CLASSIFIER_EXAMPLES_PATH = Path("app/data/classified_sites.jsonl")
+
+# Run-scoped homepage load shared by classify, detect and submit
+PAGE_SESSION_WAIT_MS = 5000
+PAGE_SESSION_TIMEOUT_MS = 60000
+
+# Detail-page enrichment of product cards
+ENRICH_MAX_CONCURRENCY = int(os.getenv("ENRICH_MAX_CONCURRENCY", "6"))
+ENRICH_PER_DOMAIN_CONCURRENCY = int(os.getenv("ENRICH_PER_DOMAIN_CONCURRENCY", "2"))
+ENRICH_CARD_TIMEOUT_SECONDS = float(os.getenv("ENRICH_CARD_TIMEOUT_SECONDS", "60"))
+ENRICH_STRUCTURED_FIRST = True    # read JSON-LD/microdata/OpenGraph over plain HTTP before rendering
+ENRICH_HTTP_TIMEOUT_SECONDS = 15.0
+ENRICH_CACHE_ENABLED = os.getenv("ENRICH_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+ENRICH_CACHE_PATH = Path("app/data/enrichment_cache.json")
+ENRICH_CACHE_FLUSH_EVERY = 25
+# How long each enriched field stays fresh; "*" covers the rest (title, brand, specs, images, ...)
+ENRICH_FIELD_MAX_AGE_SECONDS = {
+    "price": 6 * 3600,
+    "currency": 6 * 3600,
+    "availability": 6 * 3600,
+    "rating": 24 * 3600,
+    "reviews_count": 24 * 3600,
+    "seller": 7 * 24 * 3600,
+    "*": 30 * 24 * 3600,
+}
+# Learned detail-page selectors per domain (kept under "detail" in the selector cache)
+DETAIL_MAPPING_TTL_SECONDS = 30 * 24 * 3600
+DETAIL_MAPPING_MAX_MISSES = 3   # consecutive rendered pages where the mapping mostly failed before relearning
+
+# Site classification: labels cached per registered domain, and a zero-LLM pre-classifier
+DOMAIN_LABELS_PATH = Path("app/data/domain_labels.json")
+CLASSIFIER_DOMAIN_TTL_SECONDS = int(os.getenv("CLASSIFIER_DOMAIN_TTL_SECONDS", str(30 * 24 * 3600)))
+CLASSIFIER_RULE_MIN_CONFIDENCE = 0.8
+CLASSIFIER_EXAMPLE_MIN_CONFIDENCE = 0.9  # weaker rule verdicts answer the run but aren't kept as examples
+
+# Nearest-neighbour classification / few-shot selection over stored examples
+CLASSIFIER_EMBEDDING_MODEL = os.getenv("CLASSIFIER_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CLASSIFIER_EMBEDDINGS_PATH = Path("app/data/example_embeddings.npz")
+CLASSIFIER_KNN_K = 5                  # neighbours voted on, and few-shot examples sent to the LLM
+CLASSIFIER_KNN_MIN_SIMILARITY = 0.75  # cosine; farther neighbours don't vote
+CLASSIFIER_KNN_MIN_AGREEMENT = 0.8    # share of the vote weight needed to skip the LLM
+KNOWN_ECOMMERCE_DOMAINS = (
+    "amazon.com", "amazon.co.uk", "amazon.de", "amazon.fr", "amazon.es", "amazon.it", "amazon.ca",
+    "ebay.com", "ebay.co.uk", "ebay.de", "ebay.fr", "walmart.com", "target.com", "bestbuy.com",
+    "aliexpress.com", "alibaba.com", "etsy.com", "temu.com", "shein.com", "zalando.com",
+    "cdiscount.com", "fnac.com", "jumia.ma", "jumia.com", "rakuten.com", "newegg.com", "ikea.com",
+)
 
 DEFAULT_SELECTOR_CACHE_PATH = Path("app/data/selector_cache.json")
 
+# Persistent LLM response cache (shared by every chain built on get_llm)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "app/data/llm_cache.sqlite"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Search intent: rule-based parser confidence gate and memo keyed by normalized instruction
+SEARCH_INTENT_RULE_MIN_CONFIDENCE = 0.7
+SEARCH_INTENT_MEMO_PATH = Path("app/data/search_intent_memo.json")
+SEARCH_INTENT_MEMO_SIZE = 256           # in-process LRU entries
+SEARCH_INTENT_MEMO_MAX_ENTRIES = 5000   # entries kept on disk
+
 SUSPECT_TEXT_KEYWORDS = (
     "unusual traffic",
     "are you a robot",
@@ -42,16 +102,53 @@ DEFAULT_MODEL = "llama-3.1-8b-instant"
 
 DEFAULT_PROVIDER = "groq"
 
+# Local model tier (served by Ollama)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+LOCAL_MODEL = os.getenv("LOCAL_MODEL", "llama3.2:3b")
+
+# Ordered (provider, model) candidates per task; later entries are fallbacks.
+# The site classifier relies on function calling, so it stays on Groq.
+LLM_ROUTES = {
+    "search_intent": [("ollama", LOCAL_MODEL), ("groq", DEFAULT_MODEL)],
+    "search_selectors": [("groq", DEFAULT_MODEL)],
+    "card_mapping": [("groq", "llama-3.3-70b-versatile"), ("groq", DEFAULT_MODEL)],
+    "detail_mapping": [("groq", "llama-3.3-70b-versatile"), ("groq", DEFAULT_MODEL)],
+    "site_classifier": [("groq", DEFAULT_MODEL)],
+}
+LLM_PROVIDER_TIMEOUTS = {"groq": 30.0, "ollama": 20.0}
+LLM_SLOW_LATENCY_SECONDS = 8.0       # targets slower than this (EWMA) are tried last
+LLM_PROVIDER_COOLDOWN_SECONDS = 60   # skip a target this long after it fails
+
+# LLM request scheduler (defaults match Groq's free tier for llama-3.1-8b-instant)
+LLM_RPM = int(os.getenv("LLM_RPM", "30"))
+LLM_TPM = int(os.getenv("LLM_TPM", "6000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_COMPLETION_TOKENS = 256  # expected reply size added to each prompt estimate
+# Lower runs first: interactive work ahead of background classification
+LLM_PRIORITIES = {
+    "search_intent": 0,
+    "search_selectors": 1,
+    "card_mapping": 1,
+    "detail_mapping": 2,
+    "site_classifier": 2,
+}
+
 # Debug check
 if not GROQ_API_KEY:
     logger.warning("⚠️ GROQ_API_KEY not found in .env")
 
 OUTPUT_DIR = "outputs"
 
+# Process pool used to parse HTML off the event loop (0 = run on a worker thread instead)
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 # MAX_DEPTH = 5
 
 
 SEARCH_TERMS = r"(search|query|keyword|product|term|lookup|find)"
+# Heuristic candidates at or above this confidence skip the LLM search-selector call
+SEARCH_HEURISTIC_MIN_CONFIDENCE = 5
 SEARCH_ATTRS = ["id", "name", "placeholder", "aria-label", "aria-labelledby",
                 "data-testid", "data-test", "class"]
 
@@ -104,9 +201,25 @@ USER_AGENT=(
 )
 
 
+# ---- LLM prompt compaction (token budgets, ~4 chars per token) ----
+CHARS_PER_TOKEN = 4
+SEARCH_SNIPPET_TOKENS = 1500
+CARD_SNIPPET_TOKENS = 600
+DETAIL_SNIPPET_TOKENS = 1500
+CLASSIFIER_SNIPPET_TOKENS = 300
+
+COMPACT_DROP_TAGS = ("script", "style", "noscript", "svg", "template", "iframe", "link", "meta", "canvas", "object")
+COMPACT_KEEP_ATTRS = ("id", "class", "name", "type", "placeholder", "aria-label", "role", "href", "src",
+                      "action", "method", "data-testid", "data-test", "itemprop", "alt")
+SEARCH_FOCUS_SELECTORS = ("form[role='search']", "[role='search']", "form", "input", "header")
+DETAIL_FOCUS_SELECTORS = ("h1", "[itemprop]", "[id*='price']", "[class*='price']", "[id*='availability']",
+                          "[class*='stock']", "[class*='seller']", "[class*='brand']", "[class*='rating']", "main")
+
+
 MIN_SIBLINGS = 3
 TOP_K = 3
 MAX_NODES = 50
+STREAM_CHUNK_CHARS = 64 * 1024  # raw HTML fed to the incremental card parser per step
 
 
 PRICE_REGEX = re.compile(r"(?:([€$£¥]|USD|EUR|GBP|¥|DH)\s*)?([0-9]+(?:[.,][0-9]{2})?)(?:\s*([€$£¥]|USD|EUR|GBP|¥|DH))?")
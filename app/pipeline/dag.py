@@ -0,0 +1,164 @@
+"""Tiny async dependency DAG used to overlap independent pipeline steps.
+
+Steps are coroutine functions that start as soon as their dependencies have
+finished; each one records when it became ready and when it finished, so a
+run can report its critical path (the dependency chain that set the total
+wall time).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+StepFn = Callable[..., Awaitable[Any]]
+
+# the step whose coroutine is running, so steps awaited from inside it count as its deps
+_current_step: contextvars.ContextVar[Optional["StepTiming"]] = contextvars.ContextVar(
+    "current_step", default=None
+)
+
+
+@dataclass
+class StepTiming:
+    name: str
+    deps: Tuple[str, ...] = ()
+    started: Optional[float] = None   # seconds since the DAG was created
+    finished: Optional[float] = None
+    status: str = "pending"           # pending | running | done | failed | skipped | cancelled
+
+    @property
+    def duration(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+@dataclass
+class TaskDAG:
+    origin: float = field(default_factory=time.perf_counter)
+    timings: Dict[str, StepTiming] = field(default_factory=dict)
+    _tasks: Dict[str, asyncio.Task] = field(default_factory=dict)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def add(self, name: str, fn: StepFn, *, deps: Tuple[str, ...] = ()) -> asyncio.Task:
+        """Schedule `fn(*dep_results)` to run once every step in `deps` is done."""
+        if name in self._tasks:
+            self._note_dependency(name)
+            return self._tasks[name]
+        missing = [d for d in deps if d not in self._tasks]
+        if missing:
+            raise KeyError(f"Step '{name}' depends on unknown steps {missing}")
+
+        timing = self.timings[name] = StepTiming(name=name, deps=tuple(deps))
+
+        async def runner() -> Any:
+            try:
+                args = [await self._tasks[d] for d in deps]
+            except BaseException:
+                timing.status = "skipped"
+                raise
+            timing.started = self._now()
+            timing.status = "running"
+            _current_step.set(timing)
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                timing.status = "cancelled"
+                raise
+            except Exception:
+                timing.status = "failed"
+                raise
+            finally:
+                timing.finished = self._now()
+            timing.status = "done"
+            return result
+
+        task = self._tasks[name] = asyncio.create_task(runner(), name=f"step:{name}")
+        return task
+
+    async def result(self, name: str) -> Any:
+        self._note_dependency(name)
+        return await self._tasks[name]
+
+    async def run(self, name: str, fn: StepFn, *, deps: Tuple[str, ...] = ()) -> Any:
+        """Add a step and wait for it; for steps on the sequential spine of a run."""
+        return await self.add(name, fn, deps=deps)
+
+    def cancel_pending(self) -> List[str]:
+        """Cancel speculative steps nobody is going to wait for."""
+        cancelled = []
+        for name, task in self._tasks.items():
+            if not task.done():
+                task.cancel()
+                self.timings[name].status = "cancelled"
+                cancelled.append(name)
+            elif not task.cancelled() and task.exception() is not None:
+                # mark unawaited failures as retrieved so asyncio doesn't warn about them
+                logger.debug("Step %s failed: %r", name, task.exception())
+        return cancelled
+
+    async def aclose(self) -> List[str]:
+        """`cancel_pending`, then wait for the cancelled steps to unwind before their resources go away."""
+        cancelled = self.cancel_pending()
+        await asyncio.gather(*(self._tasks[name] for name in cancelled), return_exceptions=True)
+        return cancelled
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Walk back from the last step to finish through its latest-finishing dependency."""
+        finished = [t for t in self.timings.values() if t.finished is not None and t.status == "done"]
+        if not finished:
+            return [], 0.0
+        step = max(finished, key=lambda t: t.finished)
+        total = step.finished
+        path = [step.name]
+        while step.deps:
+            step = max((self.timings[d] for d in step.deps), key=lambda t: t.finished or 0.0)
+            path.append(step.name)
+        return path[::-1], total
+
+    def report(self) -> Dict[str, Any]:
+        path, total = self.critical_path()
+        return {
+            "steps": {
+                t.name: {
+                    "start_s": round(t.started, 3) if t.started is not None else None,
+                    "duration_s": round(t.duration, 3),
+                    "deps": list(t.deps),
+                    "status": t.status,
+                }
+                for t in self.timings.values()
+            },
+            "critical_path": path,
+            "total_s": round(total, 3),
+        }
+
+    def log_report(self) -> None:
+        report = self.report()
+        for name, step in report["steps"].items():
+            logger.info(
+                "Step %-10s start=%ss duration=%ss status=%s deps=%s",
+                name, step["start_s"], step["duration_s"], step["status"], step["deps"],
+            )
+        logger.info(
+            "Critical path: %s (%.3fs)",
+            " -> ".join(report["critical_path"]) or "-",
+            report["total_s"],
+        )
+
+    def _note_dependency(self, name: str) -> None:
+        current = _current_step.get()
+        if current is not None and current.name != name and name not in current.deps:
+            current.deps = (*current.deps, name)
+
+    def _now(self) -> float:
+        return time.perf_counter() - self.origin
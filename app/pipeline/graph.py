@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-import asyncio
 from typing import Any, Dict, Literal
 
 from langgraph.graph import END, StateGraph
 
 from app.core.logger import get_logger
-from app.strategies.classify_website import build_hybrid_classifier
-from app.strategies.ecommerce import run_ecommerce_flow
+from app.pipeline.dag import TaskDAG
+from app.services.page_session import PageSession
+from app.strategies.classify_website import build_hybrid_classifier_async
+from app.strategies.ecommerce import get_ecommerce_strategy, run_ecommerce_flow
 
 logger = get_logger(__name__)
 
@@ -22,11 +23,29 @@ def _metadata(state: Dict[str, Any]) -> Dict[str, Any]:
     return state["metadata"]
 
 
+def _dag(state: Dict[str, Any]) -> TaskDAG:
+    state.setdefault("dag", TaskDAG())
+    return state["dag"]
+
+
+def _page_session(state: Dict[str, Any]) -> PageSession:
+    # one homepage load per run, shared by classify, detect and submit
+    if "page_session" not in state:
+        state["page_session"] = PageSession(state["url"])
+    return state["page_session"]
+
+
 async def classify_node(state: Dict[str, Any]) -> Dict[str, Any]:
     url = state["url"]
+    dag = _dag(state)
+    session = _page_session(state)
+    # the ecommerce steps that need neither the page nor the label start now
+    # and overlap with classification; finish_node cancels them if unused
+    get_ecommerce_strategy().prepare(url, state["instruction"], dag, session)
+
     logger.info("Classifying site type for %s", url)
     try:
-        site_type = await asyncio.to_thread(build_hybrid_classifier, url)
+        site_type = await dag.run("classify", lambda: build_hybrid_classifier_async(url, session))
     except Exception as exc:  # noqa: BLE001
         logger.exception("Classification failed for %s", url)
         state["site_type"] = None
@@ -43,7 +62,9 @@ async def ecommerce_node(state: Dict[str, Any]) -> Dict[str, Any]:
     instruction = state["instruction"]
     logger.info("Running ecommerce flow for %s", url)
     try:
-        context = await run_ecommerce_flow(url, instruction)
+        context = await run_ecommerce_flow(
+            url, instruction, dag=_dag(state), after=("classify",), session=_page_session(state)
+        )
     except Exception as exc:  # noqa: BLE001
         logger.exception("Ecommerce flow failed for %s", url)
         _errors(state).append(f"ecommerce_error: {exc}")
@@ -58,6 +79,17 @@ async def ecommerce_node(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+async def finish_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    dag = _dag(state)
+    cancelled = await dag.aclose()
+    if cancelled:
+        logger.info("Cancelled unused pipeline steps: %s", cancelled)
+    await _page_session(state).close()
+    dag.log_report()
+    _metadata(state)["timings"] = dag.report()
+    return state
+
+
 def _routing_decision(state: Dict[str, Any]) -> Literal["ecommerce", "end"]:
     if state.get("site_type") == "ecommerce":
         return "ecommerce"
@@ -69,6 +101,7 @@ def build_agent_graph() -> StateGraph:
 
     graph.add_node("classify", classify_node)
     graph.add_node("ecommerce", ecommerce_node)
+    graph.add_node("finish", finish_node)
     graph.set_entry_point("classify")
 
     graph.add_conditional_edges(
@@ -76,9 +109,10 @@ def build_agent_graph() -> StateGraph:
         _routing_decision,
         {
             "ecommerce": "ecommerce",
-            "end": END,
+            "end": "finish",
         },
     )
 
-    graph.add_edge("ecommerce", END)
+    graph.add_edge("ecommerce", "finish")
+    graph.add_edge("finish", END)
     return graph.compile()
@@ -34,6 +34,19 @@ Rules:
 5. Do not add explanations.
 """
 
+DETAIL_PROMPT = """
+You are an expert HTML analyzer for e-commerce product detail pages.
+Given the HTML of one product page, identify a CSS selector (valid for the whole page)
+for each of: title, price, availability, brand, rating, reviews_count, seller, image_url.
+Prefer ids, itemprop and data-* attributes over layout classes; pick the element that holds
+the current price, not the old or per-unit one. If a field is not on the page, set it to null.
+Respond strictly in JSON with this exact shape:
+{{"title": "selector or null", "price": "selector or null", "availability": "selector or null", "brand": "selector or null", "rating": "selector or null", "reviews_count": "selector or null", "seller": "selector or null", "image_url": "selector or null"}}
+
+HTML:
+{page_html}
+"""
+
 SEARCH_SELECTORS_PROMPT = """
 You are an HTML analysis assistant that locates possible CSS selectors for the primary search input on an e-commerce site.
 
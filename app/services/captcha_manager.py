@@ -9,6 +9,7 @@ from app.core.logger import get_logger
 
 from urllib.parse import urlparse
 from app.services.session_store import SessionStore
+from app.services.cpu_pool import run_html_task
 from app.core.config import SUSPECT_SELECTORS, SUSPECT_TEXT_KEYWORDS, SUSPECT_TITLE_PATTERNS
 
 logger = get_logger(__name__)
@@ -42,6 +43,11 @@ def heuristic_captcha_detect(url: str, html: str) -> str | None:
     return None
 
 
+def _heuristic_captcha_detect_html(html: str, url: str) -> str | None:
+    # html-first signature so the call can go through run_html_task
+    return heuristic_captcha_detect(url, html)
+
+
 class CaptchaDecision(str, Enum):
     reuse_session = "reuse_session"
     manual_solve = "manual_solve"
@@ -106,3 +112,19 @@ class CaptchaManager:
         # self.log_event(url, signature, decision)
         raise CaptchaDetected(url, signature, decision)
 
+    async def ahandle(self, url: str, html: str) -> None:
+        """Like `handle`, but the soup-based heuristic runs in the process pool."""
+        if not html.strip() or not html:
+            decision = CaptchaDecision.manual_solve
+            raise CaptchaDetected(url, "empty_response", decision)
+
+        signature = self.detect(html)
+        if not signature:
+            signature = await run_html_task(_heuristic_captcha_detect_html, html, url)
+
+        if not signature:
+            return
+
+        decision = self.decide(url)
+        raise CaptchaDetected(url, signature, decision)
+
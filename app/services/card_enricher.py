@@ -1,43 +1,259 @@
-"""Asynchronous product-card enrichment."""
+"""Asynchronous product-card enrichment.
+
+`enrich_many` fetches detail pages concurrently, bounded by a global limit
+and a per-domain limit (so one shop isn't hit with every request at once),
+gives each card its own timeout, and streams every finished card to a
+`CardSink` as it completes. A card that times out or fails is kept as it
+was on the listing page rather than dropped.
+
+Each card first tries the cheap path: the detail page over plain HTTP and
+its structured data (`product_data`). The browser render and the selector
+heuristics only run when that leaves one of CORE_FIELDS empty; structured
+values still win over heuristic guesses. Between the two sit the selectors
+learned for the card's domain (`detail_mapping`): they are tried on the
+plain response before rendering, and learned from the first rendered page
+of a domain.
+
+With the enrichment cache on, a card whose cached fields are all fresh is
+answered without any fetch. When only fields the structured path provides
+have aged out (price, availability, ...), just that cheap request is made
+and the slow-moving fields (specs from the render) are kept.
+"""
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import time
+from dataclasses import dataclass, field
 import json
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
 
+from app.core.config import (
+    ENRICH_CACHE_ENABLED,
+    ENRICH_CARD_TIMEOUT_SECONDS,
+    ENRICH_MAX_CONCURRENCY,
+    ENRICH_HTTP_TIMEOUT_SECONDS,
+    ENRICH_PER_DOMAIN_CONCURRENCY,
+    ENRICH_STRUCTURED_FIRST,
+)
 from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
 from app.models.cards import Cards
-from app.services.fetcher import fetch_html
+from app.services.domain_labels import registered_domain
+from app.services.cpu_pool import run_html_task
+from app.services.detail_mapping import apply_detail_mapping, get_detail_mapping_store
+from app.services.enrichment_cache import get_enrichment_cache
+from app.services.fetcher import fetch_html, fetch_raw_html
+from app.services.product_data import CORE_FIELDS, extract_product_data, missing_fields
+from app.services.storage import CardSink, open_card_sink
+
+
+@dataclass
+class EnrichmentProgress:
+    total: int
+    done: int = 0
+    cached: int = 0
+    refreshed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, outcome: Optional[str]) -> None:
+        self.done += 1
+        if outcome == "cached":
+            self.cached += 1
+        elif outcome == "refreshed":
+            self.refreshed += 1
+        elif outcome == "failed":
+            self.failed += 1
+        elif outcome == "timeout":
+            self.timed_out += 1
+
+    def __str__(self) -> str:
+        return (
+            f"{self.done}/{self.total} cards ({self.cached} cached, {self.refreshed} refreshed, "
+            f"{self.failed} failed, {self.timed_out} timed out) in {self.elapsed:.1f}s"
+        )
+
+
+def _log_progress(progress: EnrichmentProgress) -> None:
+    logger.info("Enrichment: %s", progress)
 
 
 @dataclass
 class CardEnricher:
     wait_ms: int = 4000
     timeout_ms: Optional[int] = 45000
+    max_concurrency: int = ENRICH_MAX_CONCURRENCY
+    per_domain_concurrency: int = ENRICH_PER_DOMAIN_CONCURRENCY
+    card_timeout_s: float = ENRICH_CARD_TIMEOUT_SECONDS
+    structured_first: bool = ENRICH_STRUCTURED_FIRST
+    http_timeout_s: float = ENRICH_HTTP_TIMEOUT_SECONDS
+    use_cache: bool = ENRICH_CACHE_ENABLED
+
+    async def enrich_many(
+        self,
+        cards: List[Cards],
+        base_url: Optional[str] = None,
+        sink: Optional[CardSink] = None,
+        on_progress: Optional[Callable[[EnrichmentProgress], None]] = None,
+    ) -> List[Cards]:
+        """
+        Enrich `cards` concurrently and return them in input order. Each card
+        is written to `sink` (if given) and reported to `on_progress` as soon
+        as it finishes, in completion order.
+        """
+        progress = EnrichmentProgress(total=len(cards))
+        report = on_progress or _log_progress
+        gate = asyncio.Semaphore(self.max_concurrency)
+        domain_gates: Dict[str, asyncio.Semaphore] = {}
+        results = list(cards)
+
+        async def run_one(index: int, card: Cards):
+            # fresh cache hits need no network, so they don't queue for a slot
+            if (hit := self._cached(card, base_url)) is not None:
+                return index, hit, "cached"
+            domain = registered_domain(urljoin(base_url or "", card.url or "")) if card.url else ""
+            domain_gate = domain_gates.setdefault(domain, asyncio.Semaphore(self.per_domain_concurrency))
+            # take the domain slot first so a card queued behind a busy shop doesn't hold a global slot
+            async with domain_gate, gate:
+                try:
+                    enriched, outcome = await asyncio.wait_for(self._enrich(card, base_url), self.card_timeout_s)
+                    return index, enriched, outcome
+                except asyncio.TimeoutError:
+                    logger.warning("Enrichment timed out after %.0fs for %s", self.card_timeout_s, card.url)
+                    return index, card, "timeout"
+                except Exception as exc:
+                    logger.warning("Enrichment failed for %s: %r", card.url, exc)
+                    return index, card, "failed"
+
+        tasks = [asyncio.create_task(run_one(i, card)) for i, card in enumerate(cards)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, card, outcome = await next_done
+                results[index] = card
+                progress.record(outcome)
+                if sink is not None:
+                    sink.write(card)
+                report(progress)
+        finally:
+            # only does anything if we were cancelled part-way
+            for task in tasks:
+                task.cancel()
+            if self.use_cache:
+                get_enrichment_cache().flush()
+        return results
 
     async def enrich(self, card: Cards, base_url: Optional[str] = None) -> Cards:
+        enriched, _ = await self._enrich(card, base_url)
+        return enriched
+
+    def _cached(self, card: Cards, base_url: Optional[str]) -> Optional[Cards]:
+        """The card filled from the cache if every cached field is still fresh."""
+        if not (self.use_cache and card.url):
+            return None
+        absolute_url = urljoin(base_url or "", card.url)
+        cache = get_enrichment_cache()
+        if cache.stale_fields(absolute_url, card) != []:
+            return None
+        return card.model_copy(update={**cache.values(absolute_url), "url": absolute_url})
+
+    async def _enrich(self, card: Cards, base_url: Optional[str]) -> tuple[Cards, Optional[str]]:
+        """Enriched card plus how it was obtained: "cached", "refreshed" or None (fetched)."""
         if not card.url:
             logger.debug("Card has no URL; skipping enrichment.")
-            return card
+            return card, None
 
         absolute_url = urljoin(base_url or "", card.url)
-        html = await fetch_html(absolute_url, wait=self.wait_ms, timeout=self.timeout_ms)
+        cache = get_enrichment_cache() if self.use_cache else None
+        stale = cache.stale_fields(absolute_url, card) if cache else None
+        if stale == []:
+            return card.model_copy(update={**cache.values(absolute_url), "url": absolute_url}), "cached"
 
-        if not html:
-            logger.warning("Could not fetch detail page for %s", absolute_url)
-            return card
+        if stale and self.structured_first and set(stale) <= set(CORE_FIELDS):
+            # only the fast-moving fields aged out: the plain request is enough if it still has them
+            fresh = await self._plain_fields(absolute_url)
+            if not missing_fields(fresh, stale):
+                cache.put(absolute_url, card, fresh, complete=False)
+                updates = {**cache.values(absolute_url), "url": absolute_url}
+                return card.model_copy(update=updates), "refreshed"
+            logger.debug("Plain response for %s no longer has %s; re-enriching", absolute_url, stale)
 
-        soup = BeautifulSoup(html, "lxml")
-        enriched = card.model_copy(update=self._extract_fields(card, soup, absolute_url))
-        return enriched
+        updates = await self._fetch_updates(card, absolute_url)
+        if updates is None:
+            return card, None
+        if cache:
+            cache.put(absolute_url, card, updates)
+        return card.model_copy(update=updates), None
+
+    async def _plain_fields(self, url: str) -> dict:
+        """Fields from the unrendered page: structured data, then the domain's learned selectors."""
+        raw = await fetch_raw_html(url, timeout=self.http_timeout_s)
+        if not raw:
+            return {}
+        data = await run_html_task(extract_product_data, raw, url)
+        mapping = get_detail_mapping_store().get(url)
+        if mapping and missing_fields(data):
+            mapped = await run_html_task(apply_detail_mapping, raw, mapping)
+            data = {**self._absolute(mapped, url), **data}
+        return data
+
+    async def _mapped_fields(self, url: str, html: str) -> dict:
+        """Fields read from a rendered page with the domain's mapping, learning it on first sight."""
+        store = get_detail_mapping_store()
+        mapping = store.get(url)
+        learned = mapping is None
+        if learned:
+            mapping = await store.ensure(url, html)
+        values = await run_html_task(apply_detail_mapping, html, mapping, fallback=True)
+        if not learned:
+            store.record(url, mapping, {f: v for f, v in values.items() if f in mapping})
+        return self._absolute(values, url)
+
+    @staticmethod
+    def _absolute(values: dict, url: str) -> dict:
+        if values.get("image_url"):
+            values["image_url"] = urljoin(url, values["image_url"])
+        return values
+
+    async def _fetch_updates(self, card: Cards, absolute_url: str) -> Optional[dict]:
+        """Fields read from the detail page, or None if it couldn't be fetched at all."""
+        updates: dict = {}
+        if self.structured_first:
+            updates = await self._plain_fields(absolute_url)
+
+        missing = missing_fields(updates)
+        mapping = get_detail_mapping_store().get(absolute_url)
+        if missing and updates and mapping is not None:
+            # the domain's layout is known: render only for fields its selectors can actually read
+            missing = [f for f in missing if f in mapping or (f == "currency" and "price" in mapping)]
+        if missing:
+            if self.structured_first:
+                logger.debug("Plain response for %s lacks %s; rendering", absolute_url, missing)
+            html = await fetch_html(absolute_url, wait=self.wait_ms, timeout=self.timeout_ms)
+            if not html and not updates:
+                logger.warning("Could not fetch detail page for %s", absolute_url)
+                return None
+            if html:
+                # scripts may have injected JSON-LD the raw response didn't carry
+                rendered = await run_html_task(extract_product_data, html, absolute_url)
+                mapped = await self._mapped_fields(absolute_url, html)
+                soup = BeautifulSoup(html, "lxml")
+                updates = {**self._extract_fields(card, soup, absolute_url), **mapped, **rendered, **updates}
+
+        updates = {k: v for k, v in updates.items() if v not in (None, "")}
+        updates["url"] = absolute_url  # store absolute URL
+        return updates
 
     def _extract_fields(self, card: Cards, soup: BeautifulSoup, url: str) -> dict:
         updates: dict[str, Optional[str]] = {}
@@ -85,11 +301,10 @@ class CardEnricher:
         return updates
     
     async def _enrich_cards(self, cards: list[Cards], base_url: str, domain: str) -> None:
-        enriched: list[Cards] = []
-        for card in cards:
-            enriched_card = await self.enrich(card, base_url)
-            enriched.append(enriched_card)
+        with open_card_sink(domain) as sink:
+            enriched = await self.enrich_many(cards, base_url, sink=sink)
 
+        # the JSONL stream is complete by now; keep the ordered snapshot next to it
         output_dir = Path("app/data/products")
         output_dir.mkdir(parents=True, exist_ok=True)
         file_path = output_dir / f"{domain}_enriched.json"
@@ -5,14 +5,18 @@ from __future__ import annotations
 import re
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup, Tag
+from lxml import etree
+import soupsieve
 
 from app.models.cards import Cards
-from app.services.chains.builders import build_card_mapping_chain
+from app.services.chains.registry import get_chain
 from app.services.chains.models import CardMapping, CardMappingResult
-from app.core.config import PRICE_REGEX, MIN_SIBLINGS, MAX_NODES, TOP_K, IMAGE_ATTRS
+from app.services.cpu_pool import run_html_task
+from app.services.html_compactor import compact_html
+from app.core.config import PRICE_REGEX, MIN_SIBLINGS, MAX_NODES, TOP_K, IMAGE_ATTRS, STREAM_CHUNK_CHARS, CARD_SNIPPET_TOKENS
 
 from langchain_core.exceptions import OutputParserException
 
@@ -152,27 +156,45 @@ def discover_card_selectors(
         if match_count < min_siblings or match_count > 5000:
             continue
 
-        snippet = sample_nodes[0].prettify() if sample_nodes else ""
         candidates.append(
             CardSelectorCandidate(
                 selector=selector,
                 count=match_count,
                 avg_score=avg_score,
-                sample_html=snippet,
+                sample_html=str(sample_nodes[0]),
             )
         )
 
     candidates.sort(key=lambda c: (c.avg_score, c.count), reverse=True)
-    return candidates[:top_k]
+    top = candidates[:top_k]
+    # compact only the survivors; this snippet is what CARD_PROMPT sees
+    for cand in top:
+        cand.sample_html = compact_html(cand.sample_html, max_tokens=CARD_SNIPPET_TOKENS)
+    return top
 
 def infer_field_mapping(card_html: str) -> CardMapping:
-    chain = build_card_mapping_chain()
+    chain = get_chain("card_mapping")
     try:
         result = chain.invoke({"card_html": card_html})
     except OutputParserException as err:
         logger.error("Card mapping parser failure: %s", err)
         return _fallback_card_mapping(card_html)
 
+    return _mapping_from_result(result, card_html)
+
+
+async def infer_field_mapping_async(card_html: str) -> CardMapping:
+    chain = get_chain("card_mapping")
+    try:
+        result = await chain.ainvoke({"card_html": card_html})
+    except OutputParserException as err:
+        logger.error("Card mapping parser failure: %s", err)
+        return _fallback_card_mapping(card_html)
+
+    return _mapping_from_result(result, card_html)
+
+
+def _mapping_from_result(result, card_html: str) -> CardMapping:
     if isinstance(result, CardMappingResult) and result.candidates:
         return result.candidates[0]
 
@@ -203,71 +225,168 @@ def _fallback_card_mapping(card_html: str) -> CardMapping:
         link="a[href]" if link else None,
     )
 
-def extract_cards_with_mapping(
+_SIMPLE_SELECTOR_RE = re.compile(r"^([a-zA-Z][\w-]*)?((?:\.[\w-]+)+)$")
+
+
+def _parse_simple_selector(selector: str) -> Optional[Tuple[Optional[str], frozenset[str]]]:
+    """Split `tag.cls1.cls2` selectors (the shape we cache) into tag + classes."""
+    match = _SIMPLE_SELECTOR_RE.match(selector.strip())
+    if not match:
+        return None
+    tag = match.group(1).lower() if match.group(1) else None
+    classes = frozenset(cls for cls in match.group(2).split(".") if cls)
+    return tag, classes
+
+
+def _iter_simple_matches(html: str, tag: Optional[str], classes: frozenset[str]) -> Iterator[Tag]:
+    """
+    Feed the raw HTML to an incremental lxml parser and yield each matching
+    node as soon as its closing tag is seen. A match nested inside another
+    match is part of the outer card and not yielded on its own. Finished
+    subtrees are dropped as parsing goes, so memory stays bounded by the
+    open elements. Stops parsing when the caller stops iterating.
+    """
+
+    def matches(el) -> bool:
+        return (
+            isinstance(el.tag, str)
+            and (not tag or el.tag.lower() == tag)
+            and classes.issubset((el.get("class") or "").split())
+        )
+
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    outer = None  # the open match whose closing tag we are waiting for
+    for offset in range(0, len(html), STREAM_CHUNK_CHARS):
+        parser.feed(html[offset : offset + STREAM_CHUNK_CHARS])
+        for event, el in parser.read_events():
+            if event == "start":
+                if outer is None and matches(el):
+                    outer = el
+                continue
+            if outer is not None and el is not outer:
+                continue  # inside the card: kept until the card closes
+            node = None
+            if el is outer:
+                outer = None
+                fragment = BeautifulSoup(
+                    etree.tostring(el, encoding="unicode", method="html", with_tail=False), "lxml"
+                )
+                node = fragment.find(el.tag)
+            # done with this subtree and the finished siblings before it
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+            if isinstance(node, Tag):
+                yield node
+    parser.close()
+
+
+def _iter_matches(html: str, selector: str) -> Iterator[Tag]:
+    simple = _parse_simple_selector(selector)
+    if simple:
+        yield from _iter_simple_matches(html, *simple)
+        return
+    # Complex selectors need the full tree for combinators; still yield lazily.
+    soup = BeautifulSoup(html, "lxml")
+    yield from soupsieve.iselect(selector, soup)
+
+
+def _card_from_node(node: Tag, mapping: CardMapping, base_url: str | None) -> Cards:
+    title_el = _first(node, mapping.title)
+    price_el = _first(node, mapping.price)
+    image_el = _first(node, mapping.image)
+    link_el = _first(node, mapping.link)
+
+    title = title_el.get_text(" ", strip=True) if title_el else None
+    price = price_el.get_text(" ", strip=True) if price_el else None
+
+    image_url = None
+    if image_el:
+        image_url = (
+            image_el.get("data-src")
+            or image_el.get("src")
+            or (
+                image_el.get("srcset", "").split()[0]
+                if image_el.has_attr("srcset")
+                else None
+            )
+        )
+        if image_url:
+            image_url = image_url.strip()
+
+    if not image_url:
+        image_url = _extract_image_url(node)
+
+    if image_url and base_url:
+        image_url = urljoin(base_url, image_url)
+
+    link_url = None
+    if link_el and link_el.has_attr("href"):
+        href = link_el["href"]
+        if base_url:
+            link_url = urljoin(base_url, href)
+        else:
+            link_url = href
+
+    return Cards(
+        title=title,
+        price=price,
+        image_url=image_url,
+        url=link_url,
+    )
+
+
+def iter_cards_with_mapping(
     html: str,
     selector: str,
     mapping: CardMapping,
     *,
     base_url: str | None = None,
     limit: int = MAX_NODES,
-) -> List[Cards]:
-    soup = BeautifulSoup(html, "lxml")
-    cards: List[Cards] = []
-    seen: set[str] = set()
-
-    for node in soup.select(selector)[:limit]:
-        title_el = _first(node, mapping.title)
-        price_el = _first(node, mapping.price)
-        image_el = _first(node, mapping.image)
-        link_el = _first(node, mapping.link)
-
-        title = title_el.get_text(" ", strip=True) if title_el else None
-        price = price_el.get_text(" ", strip=True) if price_el else None
-
-        image_url = None
-        if image_el:
-            image_url = (
-                image_el.get("data-src")
-                or image_el.get("src")
-                or (
-                    image_el.get("srcset", "").split()[0]
-                    if image_el.has_attr("srcset")
-                    else None
-                )
-            )
-            if image_url:
-                image_url = image_url.strip()
-
-        if not image_url:
-            image_url = _extract_image_url(node)
+) -> Iterator[Cards]:
+    """
+    Yield unique cards one at a time as matching nodes are parsed.
+    Parsing stops once `limit` unique cards have been produced.
+    """
+    if limit <= 0:
+        return
 
-        if image_url and base_url:
-            image_url = urljoin(base_url, image_url)
-
-        link_url = None
-        if link_el and link_el.has_attr("href"):
-            href = link_el["href"]
-            if base_url:
-                link_url = urljoin(base_url, href)
-            else:
-                link_url = href
+    seen: set[str] = set()
+    produced = 0
+    for node in _iter_matches(html, selector):
+        card = _card_from_node(node, mapping, base_url)
 
-        dedupe_key = link_url or title
+        dedupe_key = card.url or card.title
         if dedupe_key and dedupe_key in seen:
             continue
         if dedupe_key:
             seen.add(dedupe_key)
 
-        cards.append(
-            Cards(
-                title=title,
-                price=price,
-                image_url=image_url,
-                url=link_url,
-            )
-        )
+        yield card
+        produced += 1
+        if produced >= limit:
+            return
 
-    return cards
+
+def extract_cards_with_mapping(
+    html: str,
+    selector: str,
+    mapping: CardMapping,
+    *,
+    base_url: str | None = None,
+    limit: int = MAX_NODES,
+) -> List[Cards]:
+    return list(
+        iter_cards_with_mapping(
+            html,
+            selector,
+            mapping,
+            base_url=base_url,
+            limit=limit,
+        )
+    )
 
 def extract_cards_from_html(
     html: str,
@@ -314,3 +433,78 @@ def extract_cards_from_html(
         limit=limit,
     )
     return CardExtractionResult(cards=cards, selector=best.selector, mapping=mapping)
+
+
+async def discover_card_selectors_async(
+    html: str,
+    *,
+    min_siblings: int = MIN_SIBLINGS,
+    top_k: int = TOP_K,
+) -> List[CardSelectorCandidate]:
+    return await run_html_task(discover_card_selectors, html, min_siblings=min_siblings, top_k=top_k)
+
+
+async def extract_cards_with_mapping_async(
+    html: str,
+    selector: str,
+    mapping: CardMapping,
+    *,
+    base_url: str | None = None,
+    limit: int = MAX_NODES,
+) -> List[Cards]:
+    return await run_html_task(
+        extract_cards_with_mapping,
+        html,
+        selector,
+        mapping,
+        base_url=base_url,
+        limit=limit,
+    )
+
+
+async def extract_cards_from_html_async(
+    html: str,
+    *,
+    base_url: str | None = None,
+    top_k: int = TOP_K,
+    limit: int = MAX_NODES,
+    cached_selector: str | None = None,
+    cached_mapping: dict | None = None,
+    reuse_cached: bool = True,
+) -> CardExtractionResult:
+    """Same flow as `extract_cards_from_html`, with parsing run in the process pool."""
+    if reuse_cached and cached_selector:
+        mapping_obj: CardMapping | None = None
+        if cached_mapping:
+            try:
+                mapping_obj = CardMapping(**cached_mapping)
+            except Exception:
+                mapping_obj = None
+        if mapping_obj:
+            cards = await extract_cards_with_mapping_async(
+                html,
+                cached_selector,
+                mapping_obj,
+                base_url=base_url,
+                limit=limit,
+            )
+            return CardExtractionResult(
+                cards=cards,
+                selector=cached_selector,
+                mapping=mapping_obj,
+            )
+
+    candidates = await discover_card_selectors_async(html, top_k=top_k)
+    if not candidates:
+        return CardExtractionResult(cards=[], selector=None, mapping=None)
+
+    best = candidates[0]
+    mapping = await infer_field_mapping_async(best.sample_html)
+    cards = await extract_cards_with_mapping_async(
+        html,
+        best.selector,
+        mapping,
+        base_url=base_url,
+        limit=limit,
+    )
+    return CardExtractionResult(cards=cards, selector=best.selector, mapping=mapping)
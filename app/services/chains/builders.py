@@ -8,52 +8,63 @@ from langchain_core.utils.function_calling import convert_to_openai_function
 
 from app.prompts.prompts import (
     CARD_PROMPT,
+    DETAIL_PROMPT,
     EXPANDED_CLASSIFIER_PROMPT,
     SEARCH_INTENT_PROMPT,
     SEARCH_SELECTORS_PROMPT,
 )
-from app.services.chains.models import CardMappingResult, SearchIntentSchema
-from app.services.llm_engine import get_llm
+from app.services.chains.models import CardMappingResult, DetailMapping, SearchIntentSchema
+from app.services.llm_router import route_llm
 from app.services.chains.models import WebsiteTypeClassifier
 
 
-def build_site_classifier_chain(url, snippet, examples_str):
-    llm = get_llm().bind(
-        functions=[convert_to_openai_function(WebsiteTypeClassifier)],
-        function_call={"name": "WebsiteTypeClassifier"},
-    )
+# 🔒 soft token control via char limit (~4 chars ≈ 1 token rough)
+MAX_EXAMPLES_CHARS = 4000
+
+
+def build_site_classifier_chain():
     parser = PydanticAttrOutputFunctionsParser(
         pydantic_schema=WebsiteTypeClassifier,
         attr_name="site_type",
     )
+    # the parser runs per target, so an unparseable reply falls through to the next one
+    llm = route_llm("site_classifier", parser=parser).bind(
+        functions=[convert_to_openai_function(WebsiteTypeClassifier)],
+        function_call={"name": "WebsiteTypeClassifier"},
+    )
+    prompt = PromptTemplate.from_template(EXPANDED_CLASSIFIER_PROMPT)
+    return prompt | llm
+
 
-    # 🔒 soft token control via char limit (~4 chars ≈ 1 token rough)
-    MAX_EXAMPLES_CHARS = 4000
+def site_classifier_inputs(url: str, snippet: str, examples_str: str) -> dict:
+    """Per-call values for the prebuilt site classifier chain."""
     if examples_str and len(examples_str) > MAX_EXAMPLES_CHARS:
         examples_str = examples_str[:MAX_EXAMPLES_CHARS]
-        
-    prompt = EXPANDED_CLASSIFIER_PROMPT.format(
-        url=url,
-        snippet=snippet,
-        examples=examples_str if examples_str else "No examples yet."
-    )
-    return prompt | llm | parser
+    return {
+        "url": url,
+        "snippet": snippet,
+        "examples": examples_str if examples_str else "No examples yet.",
+    }
 
 def build_card_mapping_chain():
     parser = PydanticOutputParser(pydantic_object=CardMappingResult)
     prompt = PromptTemplate.from_template(CARD_PROMPT.strip())
-    llm = get_llm().bind(temperature=0)
-    return prompt | llm | parser
+    return prompt | route_llm("card_mapping", parser=parser)
+
+
+def build_detail_mapping_chain():
+    parser = PydanticOutputParser(pydantic_object=DetailMapping)
+    prompt = PromptTemplate.from_template(DETAIL_PROMPT.strip())
+    return prompt | route_llm("detail_mapping", parser=parser)
 
 
 def build_search_intent_chain():
     parser = PydanticOutputParser(pydantic_object=SearchIntentSchema)
     prompt = PromptTemplate.from_template(SEARCH_INTENT_PROMPT.strip())
-    llm = get_llm()
-    return prompt | llm | parser
+    return prompt | route_llm("search_intent", parser=parser)
 
 
 def build_search_selector_chain():
     prompt = PromptTemplate.from_template(SEARCH_SELECTORS_PROMPT.strip())
-    llm = get_llm()
+    llm = route_llm("search_selectors")
     return prompt | llm | StrOutputParser()
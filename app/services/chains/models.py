@@ -50,6 +50,17 @@ class CardMappingResult(BaseModel):
     )
 
 
+class DetailMapping(BaseModel):
+    title: Optional[str] = Field(default=None, description="Selector for the product title.")
+    price: Optional[str] = Field(default=None, description="Selector for the current price.")
+    availability: Optional[str] = Field(default=None, description="Selector for the stock/availability text.")
+    brand: Optional[str] = Field(default=None, description="Selector for the brand name.")
+    rating: Optional[str] = Field(default=None, description="Selector for the average rating.")
+    reviews_count: Optional[str] = Field(default=None, description="Selector for the number of reviews.")
+    seller: Optional[str] = Field(default=None, description="Selector for the seller / merchant name.")
+    image_url: Optional[str] = Field(default=None, description="Selector for the main product image.")
+
+
 class SearchConditionModel(BaseModel):
     name: str = Field(..., description="Machine friendly condition name, e.g. price_max, brand.")
     value: str = Field(..., description="Human readable value to apply.")
@@ -0,0 +1,65 @@
+"""Process-wide registry of prebuilt chains.
+
+Chains are built once (prompt, LLM binding, parser) and shared; per-call
+values are passed only as `invoke` inputs. Each chain carries its
+scheduler priority class from LLM_PRIORITIES.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from langchain_core.runnables import Runnable
+
+from app.core.config import LLM_PRIORITIES
+from app.core.logger import get_logger
+from app.services.chains.builders import (
+    build_card_mapping_chain,
+    build_detail_mapping_chain,
+    build_search_intent_chain,
+    build_search_selector_chain,
+    build_site_classifier_chain,
+)
+from app.services import llm_router
+from app.services.llm_scheduler import DEFAULT_PRIORITY, PrioritizedRunnable
+
+logger = get_logger(__name__)
+
+_BUILDERS: Dict[str, Callable[[], Runnable]] = {
+    "site_classifier": build_site_classifier_chain,
+    "card_mapping": build_card_mapping_chain,
+    "detail_mapping": build_detail_mapping_chain,
+    "search_intent": build_search_intent_chain,
+    "search_selectors": build_search_selector_chain,
+}
+
+_chains: Dict[str, Runnable] = {}
+_lock = threading.Lock()
+
+
+def get_chain(name: str) -> Runnable:
+    chain = _chains.get(name)
+    if chain is not None:
+        return chain
+    with _lock:
+        if name not in _chains:
+            try:
+                builder = _BUILDERS[name]
+            except KeyError:
+                raise KeyError(f"Unknown chain '{name}'") from None
+            _chains[name] = PrioritizedRunnable(builder(), LLM_PRIORITIES.get(name, DEFAULT_PRIORITY))
+        return _chains[name]
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> None:
+    """Build the LLM clients and chains up front so the first request does not pay for it."""
+    names = list(names or _BUILDERS)
+    for name in names:
+        get_chain(name)
+    # chains reach their models through the router, which creates clients on first call
+    targets = llm_router.warm_up(names)
+    logger.info(
+        "Prebuilt chains: %s; LLM clients: %s",
+        ", ".join(sorted(_chains)), ", ".join(f"{p}:{m}" for p, m in targets) or "none",
+    )
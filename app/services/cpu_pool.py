@@ -0,0 +1,161 @@
+"""Bounded process pool for CPU-heavy HTML work called from async code."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import CPU_POOL_WORKERS
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# modules the HTML tasks live in; a spawned worker imports them on its first task
+WARM_UP_MODULES = (
+    "app.services.card_selector",
+    "app.services.detail_mapping",
+    "app.services.html_compactor",
+    "app.services.product_data",
+)
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    if _pool is None:
+        # spawn: forking next to a live Playwright driver is not safe
+        _pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("Started HTML process pool with %d workers", CPU_POOL_WORKERS)
+    return _pool
+
+
+def _get_slots() -> asyncio.Semaphore:
+    """Cap in-flight jobs so shared-memory segments cannot pile up in the queue."""
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots = asyncio.Semaphore(max(1, CPU_POOL_WORKERS) * 2)
+        _slots_loop = loop
+    return _slots
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Open the parent's segment without registering it with the resource
+    tracker: the parent owns and unlinks it, and a second registration from
+    the worker ends in leak warnings or a double unlink at shutdown.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # workers run one task at a time, so the swap can't race another attach
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _call_with_shared_html(func: Callable[..., T], shm_name: str, size: int, args: tuple, kwargs: dict) -> T:
+    """Worker side: decode the HTML straight out of shared memory and run `func`."""
+    shm = _attach(shm_name)
+    try:
+        with shm.buf[:size] as view:
+            html = str(view, "utf-8")
+    finally:
+        shm.close()
+    return func(html, *args, **kwargs)
+
+
+async def run_html_task(func: Callable[..., T], html: str, *args: Any, **kwargs: Any) -> T:
+    """
+    Run `func(html, *args, **kwargs)` in the process pool without blocking the loop.
+
+    `func` must be a module-level function and its result picklable. The HTML
+    travels as UTF-8 bytes in a shared-memory segment instead of the pickled
+    call payload.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, html, *args, **kwargs)
+
+    payload = html.encode("utf-8")
+    async with _get_slots():
+        shm = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        release = partial(_release, shm)
+        try:
+            shm.buf[: len(payload)] = payload
+            future = pool.submit(_call_with_shared_html, func, shm.name, len(payload), args, kwargs)
+        except BaseException as exc:
+            release()
+            if isinstance(exc, BrokenProcessPool):
+                logger.error("HTML process pool crashed; it will be recreated on next use")
+                shutdown_pool(wait=False)
+            raise
+        # unlink once the worker is done with the segment, even if this coroutine is cancelled first
+        future.add_done_callback(lambda _: release())
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            logger.error("HTML process pool crashed; it will be recreated on next use")
+            shutdown_pool(wait=False)
+            raise
+
+
+def _release(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _warm_worker(modules: tuple, hold: float) -> int:
+    for module in modules:
+        importlib.import_module(module)
+    # stay busy briefly so the executor hands the other warm-up calls to other workers
+    time.sleep(hold)
+    return os.getpid()
+
+
+async def warm_up() -> None:
+    """Spawn every worker and import the task modules before the first HTML task needs them."""
+    pool = _get_pool()
+    if pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        pids = await asyncio.gather(*(
+            loop.run_in_executor(pool, _warm_worker, WARM_UP_MODULES, 0.05) for _ in range(CPU_POOL_WORKERS)
+        ))
+    except Exception as exc:  # the first real task will spawn them anyway
+        logger.warning("HTML process pool warm-up failed: %r", exc)
+        return
+    logger.info("Warmed %d HTML workers in %.2fs", len(set(pids)), time.perf_counter() - started)
+
+
+def shutdown_pool(wait: bool = True) -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
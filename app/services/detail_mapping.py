@@ -0,0 +1,295 @@
+"""Detail-page field selectors learned once per domain.
+
+The listing side caches `card.mapping` per domain; this is the same idea
+for product detail pages. The first rendered detail page of a domain is
+searched with a list of known selector patterns per field, and only the
+fields still missing are asked of the LLM, in one call. Every selector is
+checked against that page (the value must look like a price, a rating,
+...) before it is kept, and the result is stored under "detail" in the
+selector cache.
+
+Only specific patterns (ids, itemprops, test ids) are stored; loose ones
+such as `h1` or `[class*='price']` are read per page for fields the
+mapping lacks and never become part of it.
+
+Later pages go straight to the mapping: `apply_detail_mapping` runs the
+precompiled selectors and returns only values that pass the same checks.
+A mapping that keeps failing on rendered pages is dropped and relearned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+from langchain_core.exceptions import OutputParserException
+
+from app.core.config import (
+    DETAIL_FOCUS_SELECTORS,
+    DETAIL_MAPPING_MAX_MISSES,
+    DETAIL_MAPPING_TTL_SECONDS,
+    DETAIL_SNIPPET_TOKENS,
+    PRICE_REGEX,
+)
+from app.core.logger import get_logger
+from app.services.chains.models import DetailMapping
+from app.services.chains.registry import get_chain
+from app.services.cpu_pool import run_html_task
+from app.services.html_compactor import compact_html
+from app.services.product_data import parse_float, parse_int
+from app.services.selector_store import SelectorStore
+
+logger = get_logger(__name__)
+
+DETAIL_FIELDS = tuple(DetailMapping.model_fields)
+
+# tried in order; the first one whose value passes the field's check wins and is stored
+CANDIDATE_SELECTORS: Dict[str, tuple] = {
+    "title": ("#productTitle", "h1[itemprop='name']", "[data-testid*='title'] h1"),
+    "price": (
+        "[itemprop='price']", "#corePrice_feature_div .a-offscreen", ".a-price .a-offscreen",
+        "#priceblock_ourprice", "#priceblock_dealprice", "[data-testid*='price']", "[data-test*='price']",
+        "[class*='product-price']",
+    ),
+    "availability": ("#availability", "[itemprop='availability']", "[data-testid*='availability']"),
+    "brand": ("#bylineInfo", "[itemprop='brand']", "[data-testid*='brand']"),
+    "rating": ("[itemprop='ratingValue']", "#acrPopover", "[data-testid*='rating']"),
+    "reviews_count": (
+        "[itemprop='reviewCount']", "#acrCustomerReviewText", "[data-testid*='review']", "[class*='review-count']",
+    ),
+    "seller": ("#sellerProfileTriggerId", "#merchant-info", "[data-testid*='seller']"),
+    "image_url": ("#landingImage", "img[itemprop='image']", "img[data-old-hires]"),
+}
+
+# loose patterns that match something on most pages: read per page for fields the mapping
+# lacks, never stored, so a field only they find is still asked of the LLM
+GENERIC_SELECTORS: Dict[str, tuple] = {
+    "title": ("h1",),
+    "price": ("[class*='price'] [class*='current']", "[class*='price']"),
+    "availability": ("[class*='availability']", "[class*='stock']"),
+    "brand": ("[class*='brand']",),
+    "rating": ("[class*='rating']",),
+    "reviews_count": ("[class*='reviews']",),
+    "seller": ("[class*='seller']",),
+    "image_url": ("[class*='gallery'] img", "main img"),
+}
+
+# fields worth one LLM call when the known patterns miss them
+LLM_FIELDS = ("price", "availability", "brand", "seller")
+
+_MAX_TEXT = {"price": 40, "availability": 80, "brand": 80, "seller": 80, "title": 300}
+
+
+# -- values and checks ---------------------------------------------------
+
+def _value(el: Tag, field: str) -> Optional[str]:
+    if field == "image_url":
+        for attr in ("data-old-hires", "src", "data-src", "content", "srcset"):
+            if el.get(attr):
+                return el[attr].split()[0]
+        return None
+    # ratings often live in an attribute ("4.5 out of 5 stars")
+    for text in (el.get("content"), el.get_text(" ", strip=True), el.get("title"), el.get("aria-label")):
+        text = " ".join((text or "").split())
+        if text:
+            return text
+    return None
+
+
+def _check(field: str, value: Optional[str]):
+    """The value converted for the card, or None if it doesn't look like `field`."""
+    if not value:
+        return None
+    if field == "rating":
+        rating = parse_float(value)
+        return rating if rating is not None and 0 < rating <= 5 else None
+    if field == "reviews_count":
+        return parse_int(value) if re.search(r"\d", value) and len(value) <= 40 else None
+    if field == "image_url":
+        return value if value.startswith(("http", "//", "/")) else None
+    if len(value) > _MAX_TEXT.get(field, 80):
+        return None
+    if field == "price":
+        match = PRICE_REGEX.search(value)
+        return value if match and re.search(r"\d", match.group(0)) else None
+    return value if len(value) >= 2 else None
+
+
+def _first_valid(soup: BeautifulSoup, matcher, field: str):
+    for el in matcher.select(soup, limit=5):
+        checked = _check(field, _value(el, field))
+        if checked is not None:
+            return checked
+    return None
+
+
+@lru_cache(maxsize=128)
+def _compile(mapping_json: str) -> Dict[str, "soupsieve.SoupSieve"]:
+    """Compiled selectors per field; cached per mapping, so each worker compiles a domain's once."""
+    compiled = {}
+    for field, selector in json.loads(mapping_json).items():
+        if not selector or field not in DETAIL_FIELDS:
+            continue
+        try:
+            compiled[field] = soupsieve.compile(selector)
+        except soupsieve.SelectorSyntaxError:
+            continue
+    return compiled
+
+
+# -- HTML tasks (module-level so they can run through run_html_task) -----
+
+def apply_detail_mapping(
+    html: str, mapping: Dict[str, Optional[str]], fallback: bool = False
+) -> Dict[str, object]:
+    """
+    Card updates read with `mapping`; only values that pass their field's
+    check. With `fallback`, fields the mapping has no selector for are
+    read with GENERIC_SELECTORS on this page.
+    """
+    compiled = _compile(json.dumps(mapping, sort_keys=True))
+    if not html or not (compiled or fallback):
+        return {}
+    soup = BeautifulSoup(html, "lxml")
+    values = {}
+    for field, matcher in compiled.items():
+        checked = _first_valid(soup, matcher, field)
+        if checked is not None:
+            values[field] = checked
+    if fallback:
+        for field, selectors in GENERIC_SELECTORS.items():
+            if field in compiled:
+                continue
+            for selector in selectors:
+                checked = _first_valid(soup, _compile(json.dumps({field: selector}))[field], field)
+                if checked is not None:
+                    values[field] = checked
+                    break
+    if "price" in values:
+        # "€ 19,99" / "19.99 USD": the symbol or code next to the amount
+        match = PRICE_REGEX.search(values["price"])
+        currency = match.group(1) or match.group(3)
+        if currency:
+            values["currency"] = currency
+    return values
+
+
+def learn_detail_mapping(html: str) -> Dict[str, str]:
+    """The first known selector per field that yields a plausible value on this page."""
+    soup = BeautifulSoup(html, "lxml")
+    mapping = {}
+    for field, selectors in CANDIDATE_SELECTORS.items():
+        for selector in selectors:
+            if _first_valid(soup, _compile(json.dumps({field: selector}))[field], field) is not None:
+                mapping[field] = selector
+                break
+    return mapping
+
+
+async def infer_detail_mapping_async(html: str) -> Dict[str, str]:
+    page_html = await run_html_task(
+        compact_html, html, max_tokens=DETAIL_SNIPPET_TOKENS, focus=DETAIL_FOCUS_SELECTORS
+    )
+    try:
+        result = await get_chain("detail_mapping").ainvoke({"page_html": page_html})
+    except OutputParserException as err:
+        logger.error("Detail mapping parser failure: %s", err)
+        return {}
+    if isinstance(result, dict):
+        result = DetailMapping(**result)
+    return {k: v for k, v in result.model_dump().items() if v}
+
+
+# -- per-domain store ----------------------------------------------------
+
+class DetailMappingStore:
+    def __init__(self, selector_store: SelectorStore | None = None):
+        self.selector_store = selector_store or SelectorStore()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._misses: Dict[str, int] = {}
+        # domains where nothing could be learned: not retried on every card of this run
+        self._unlearnable: set = set()
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        """The learned mapping for the URL's domain, or None if not learned (or expired, or empty)."""
+        entry = self.selector_store.get(self._domain(url)).get("detail")
+        if not entry or time.time() - entry.get("learned_at", 0) > DETAIL_MAPPING_TTL_SECONDS:
+            return None
+        return entry["mapping"] or None
+
+    async def ensure(self, url: str, html: str) -> Dict[str, str]:
+        """Mapping for the URL's domain, learning it from `html` (a rendered page) if needed."""
+        domain = self._domain(url)
+        # concurrent cards of one shop learn it once; the rest wait and reuse it
+        async with self._locks.setdefault(domain, asyncio.Lock()):
+            mapping = self.get(url)
+            if mapping is not None:
+                return mapping
+            if domain in self._unlearnable:
+                return {}
+
+            mapping = await run_html_task(learn_detail_mapping, html)
+            source = "heuristic"
+            if any(f not in mapping for f in LLM_FIELDS):
+                try:
+                    suggested = await infer_detail_mapping_async(html)
+                except Exception as exc:
+                    # don't pin a partial mapping for a month because the LLM was briefly down
+                    logger.warning("Detail mapping LLM call failed for %s: %r", domain, exc)
+                    return mapping
+                confirmed = await run_html_task(apply_detail_mapping, html, suggested)
+                gained = {f: suggested[f] for f in suggested if f in confirmed and f not in mapping}
+                if gained:
+                    source = "heuristic+llm" if mapping else "llm"
+                    mapping.update(gained)
+
+            if not mapping:
+                # an empty mapping would pin "nothing to read" for a month; the next run tries again
+                logger.info("No detail mapping found for %s", domain)
+                self._unlearnable.add(domain)
+                return mapping
+            self.selector_store.set(
+                domain, {"detail": {"mapping": mapping, "source": source, "learned_at": int(time.time())}}
+            )
+            self._misses.pop(domain, None)
+            logger.info("Learned detail mapping for %s (%s): %s", domain, source, ", ".join(sorted(mapping)))
+            return mapping
+
+    def record(self, url: str, mapping: Dict[str, str], values: Dict[str, object]) -> None:
+        """
+        Track how the mapping did on a rendered page. After
+        DETAIL_MAPPING_MAX_MISSES pages in a row where most of its selectors
+        failed, it is dropped so the next page relearns it.
+        """
+        if not mapping:
+            return
+        domain = self._domain(url)
+        if len(values) * 2 >= len(mapping):
+            self._misses.pop(domain, None)
+            return
+        self._misses[domain] = self._misses.get(domain, 0) + 1
+        if self._misses[domain] >= DETAIL_MAPPING_MAX_MISSES:
+            logger.info("Detail mapping for %s keeps missing; relearning on the next page", domain)
+            self.selector_store.set(domain, {"detail": None})
+            self._misses.pop(domain, None)
+
+
+_store: DetailMappingStore | None = None
+
+
+def get_detail_mapping_store() -> DetailMappingStore:
+    global _store
+    if _store is None:
+        _store = DetailMappingStore()
+    return _store
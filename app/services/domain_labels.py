@@ -0,0 +1,76 @@
+"""Site-type labels cached per registered domain, with a TTL.
+
+`https://www.amazon.com/` and `https://www.amazon.com/s?k=x` share one
+entry (`amazon.com`), so a domain is fetched and classified at most once
+per CLASSIFIER_DOMAIN_TTL_SECONDS. Domains in KNOWN_ECOMMERCE_DOMAINS are
+answered without touching the file at all.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+import tldextract
+
+from app.core.config import (
+    CLASSIFIER_DOMAIN_TTL_SECONDS,
+    DOMAIN_LABELS_PATH,
+    KNOWN_ECOMMERCE_DOMAINS,
+)
+
+# bundled public-suffix snapshot only: no network fetch at import time
+_extract = tldextract.TLDExtract(suffix_list_urls=())
+
+
+def registered_domain(url: str) -> str:
+    """eTLD+1 of the URL ("www.amazon.co.uk" -> "amazon.co.uk"); the bare host for IPs/localhost."""
+    parts = _extract(url)
+    if hasattr(parts, "top_domain_under_public_suffix"):
+        domain = parts.top_domain_under_public_suffix
+    else:  # tldextract < 5.3
+        domain = parts.registered_domain
+    return (domain or urlparse(url).hostname or url).lower()
+
+
+class DomainLabelStore:
+    def __init__(self, path: Path | str = DOMAIN_LABELS_PATH, ttl: int = CLASSIFIER_DOMAIN_TTL_SECONDS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            return {}
+
+    def _dump(self, data: dict) -> None:
+        self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    def get(self, url: str) -> Optional[str]:
+        domain = registered_domain(url)
+        if domain in KNOWN_ECOMMERCE_DOMAINS:
+            return "ecommerce"
+        entry = self._load().get(domain)
+        if not entry or time.time() - entry.get("ts", 0) > self.ttl:
+            return None
+        return entry.get("label")
+
+    def set(self, url: str, label: str, source: str) -> None:
+        data = self._load()
+        data[registered_domain(url)] = {"label": label, "source": source, "ts": int(time.time())}
+        self._dump(data)
+
+
+_store: DomainLabelStore | None = None
+
+
+def get_domain_label_store() -> DomainLabelStore:
+    global _store
+    if _store is None:
+        _store = DomainLabelStore()
+    return _store
@@ -0,0 +1,167 @@
+"""Per-URL cache of enriched card fields with per-field freshness.
+
+Each detail-page URL keeps the fields enrichment found, each with the time
+it was fetched, plus two fingerprints: one of the listing card it was
+enriched from and one of the enriched content. ENRICH_FIELD_MAX_AGE_SECONDS
+says how long each field stays fresh (prices for hours, specs for weeks), so
+a recurring run only goes back to a detail page when a field it cares about
+has aged out, or when the listing card itself changed (new price or title
+on the results page).
+
+Entries live in memory and are written to ENRICH_CACHE_PATH every
+ENRICH_CACHE_FLUSH_EVERY updates and when a batch finishes. Several
+processes can share the file: a flush takes a lock, merges with what is on
+disk (the newer `fetched_at` wins per URL) and then replaces the file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import (
+    ENRICH_CACHE_FLUSH_EVERY,
+    ENRICH_CACHE_PATH,
+    ENRICH_FIELD_MAX_AGE_SECONDS,
+)
+from app.core.logger import get_logger
+from app.models.cards import Cards
+
+try:
+    import fcntl
+except ImportError:  # Windows: flushes still merge, just without the lock
+    fcntl = None
+
+logger = get_logger(__name__)
+
+# listing fields whose change means the detail page may have changed too
+LISTING_FIELDS = ("title", "name", "price", "image_url")
+
+
+def fingerprint(values: Dict[str, Any]) -> str:
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def listing_fingerprint(card: Cards) -> str:
+    return fingerprint({f: getattr(card, f) for f in LISTING_FIELDS})
+
+
+class EnrichmentCache:
+    def __init__(self, path: Path | str = ENRICH_CACHE_PATH, max_age: Dict[str, int] = ENRICH_FIELD_MAX_AGE_SECONDS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+        self._entries: Optional[Dict[str, dict]] = None
+        self._pending = 0
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> Dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            logger.warning("Ignoring unreadable enrichment cache %s", self.path)
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path.with_suffix(f"{self.path.suffix}.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _dump(self, data: Dict[str, dict]) -> None:
+        tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _age_limit(self, field: str) -> int:
+        return self.max_age.get(field, self.max_age["*"])
+
+    # -- reads -----------------------------------------------------------
+
+    def stale_fields(self, url: str, card: Cards) -> Optional[List[str]]:
+        """
+        None when the URL has to be enriched from scratch (unknown, or the
+        listing card changed); otherwise the cached fields that have aged
+        out, [] meaning everything is fresh.
+        """
+        entry = self._load().get(url)
+        if not entry or entry.get("listing_fp") != listing_fingerprint(card):
+            return None
+        now = time.time()
+        return [
+            name for name, field in entry["fields"].items()
+            if now - field["ts"] > self._age_limit(name)
+        ]
+
+    def values(self, url: str) -> Dict[str, Any]:
+        entry = self._load().get(url) or {"fields": {}}
+        return {name: field["value"] for name, field in entry["fields"].items()}
+
+    # -- writes ----------------------------------------------------------
+
+    def put(self, url: str, card: Cards, updates: Dict[str, Any], complete: bool = True) -> bool:
+        """
+        Record freshly fetched `updates` for `url`. With `complete`, they are
+        the whole detail page and replace what was cached; otherwise only the
+        given fields are refreshed. Returns True if the content changed.
+        """
+        entries = self._load()
+        now = time.time()
+        previous = entries.get(url)
+        fields = {} if complete or not previous else dict(previous["fields"])
+        for name, value in updates.items():
+            if name != "url" and value not in (None, ""):
+                fields[name] = {"value": value, "ts": now}
+        content_fp = fingerprint({name: field["value"] for name, field in fields.items()})
+        entries[url] = {
+            "listing_fp": listing_fingerprint(card),
+            "content_fp": content_fp,
+            "fetched_at": now,
+            "fields": fields,
+        }
+        self._pending += 1
+        if self._pending >= ENRICH_CACHE_FLUSH_EVERY:
+            self.flush()
+        return previous is None or previous.get("content_fp") != content_fp
+
+    def flush(self) -> None:
+        if self._entries is None or not self._pending:
+            return
+        with self._locked():
+            # other processes may have flushed since we loaded: keep the newer entry per URL
+            merged = self._read()
+            for url, entry in self._entries.items():
+                if url not in merged or merged[url].get("fetched_at", 0) <= entry["fetched_at"]:
+                    merged[url] = entry
+            # drop URLs whose every field would be refetched anyway
+            horizon = time.time() - max(self.max_age.values())
+            self._entries = {url: e for url, e in merged.items() if e.get("fetched_at", 0) >= horizon}
+            self._dump(self._entries)
+        self._pending = 0
+
+
+_cache: EnrichmentCache | None = None
+
+
+def get_enrichment_cache() -> EnrichmentCache:
+    global _cache
+    if _cache is None:
+        _cache = EnrichmentCache()
+    return _cache
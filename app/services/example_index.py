@@ -0,0 +1,186 @@
+"""Nearest-neighbour index over the classifier's stored examples.
+
+Snippets are embedded with a sentence-transformers model into a row-
+normalized NumPy matrix, so cosine similarity is a single matrix-vector
+product. The classifier uses it two ways: answer directly when the top-k
+neighbours agree strongly, otherwise pass only the k most similar examples
+to the LLM as few-shot context.
+
+Embeddings are persisted next to the examples and only new examples are
+encoded on refresh. If the model can't be loaded, `nearest` returns None
+and the classifier falls back to `select_examples`.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    CLASSIFIER_EMBEDDING_MODEL,
+    CLASSIFIER_EMBEDDINGS_PATH,
+    CLASSIFIER_KNN_K,
+    CLASSIFIER_KNN_MIN_AGREEMENT,
+    CLASSIFIER_KNN_MIN_SIMILARITY,
+)
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Neighbor:
+    example: dict
+    similarity: float
+
+
+class ExampleIndex:
+    def __init__(self, model_name: str = CLASSIFIER_EMBEDDING_MODEL, path: Path | str = CLASSIFIER_EMBEDDINGS_PATH):
+        self.model_name = model_name
+        self.path = Path(path)
+        self._model = None
+        self._model_failed = False
+        self._urls: List[str] = []
+        self._examples: List[dict] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    # -- embedding -------------------------------------------------------
+
+    def _encoder(self):
+        if self._model is None and not self._model_failed:
+            try:
+                # imported lazily: torch is slow to import and only needed on a cache miss
+                from sentence_transformers import SentenceTransformer
+
+                self._model = SentenceTransformer(self.model_name)
+            except Exception as exc:  # missing package, no weights offline, ...
+                logger.warning("Embedding model '%s' unavailable (%s); using balanced examples", self.model_name, exc)
+                self._model_failed = True
+        return self._model
+
+    def encode(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        model = self._encoder()
+        if model is None:
+            return None
+        vectors = np.asarray(model.encode(list(texts), batch_size=32, show_progress_bar=False), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    # -- index maintenance -----------------------------------------------
+
+    def refresh(self, examples: Sequence[dict]) -> bool:
+        """Bring the matrix up to date with `examples`, encoding only unseen URLs."""
+        with self._lock:
+            if self._matrix is None:
+                self._load()
+            known = set(self._urls)
+            fresh = [e for e in examples if e["url"] not in known]
+            by_url = {e["url"]: e for e in examples}
+            # labels/snippets may have been corrected for URLs already indexed
+            self._examples = [by_url.get(url, ex) for url, ex in zip(self._urls, self._examples)]
+            if not fresh:
+                return self._matrix is not None or self._encoder() is not None
+
+            vectors = self.encode([_text(e) for e in fresh])
+            if vectors is None:
+                return False
+            self._matrix = vectors if self._matrix is None or not len(self._urls) else np.vstack([self._matrix, vectors])
+            self._urls.extend(e["url"] for e in fresh)
+            self._examples.extend(fresh)
+            self._save()
+            logger.info("Example index: embedded %d new examples (%d total)", len(fresh), len(self._urls))
+            return True
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            stored = np.load(self.path, allow_pickle=False)
+            if str(stored["model"]) != self.model_name:
+                return
+            self._matrix = stored["matrix"].astype(np.float32)
+            self._urls = [str(u) for u in stored["urls"]]
+            # snippets/labels are re-attached from the example store by refresh()
+            self._examples = [{"url": u} for u in self._urls]
+        except (OSError, KeyError, ValueError) as exc:
+            logger.warning("Ignoring unreadable embeddings cache %s: %s", self.path, exc)
+            self._matrix, self._urls, self._examples = None, [], []
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("wb") as fh:
+            np.savez(fh, model=np.array(self.model_name), urls=np.array(self._urls), matrix=self._matrix)
+
+    # -- queries ---------------------------------------------------------
+
+    def nearest(self, text: str, examples: Sequence[dict], k: int = CLASSIFIER_KNN_K) -> Optional[List[Neighbor]]:
+        if not self.refresh(examples):
+            return None
+        if self._matrix is None or not len(self._urls):
+            return []
+        query = self.encode([text])
+        if query is None:
+            return None
+        sims = self._matrix @ query[0]
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [
+            Neighbor(example=self._examples[i], similarity=float(sims[i]))
+            for i in top
+            if "label" in self._examples[i]
+        ]
+
+
+def vote(
+    neighbors: Sequence[Neighbor],
+    min_similarity: float = CLASSIFIER_KNN_MIN_SIMILARITY,
+    min_agreement: float = CLASSIFIER_KNN_MIN_AGREEMENT,
+) -> Tuple[Optional[str], float]:
+    """
+    Similarity-weighted vote among neighbours above `min_similarity`.
+    Returns (label, agreement) when the winner holds `min_agreement` of the
+    weight and at least two close neighbours back it, else (None, agreement).
+    """
+    close = [n for n in neighbors if n.similarity >= min_similarity]
+    if not close:
+        return None, 0.0
+    weights = defaultdict(float)
+    for n in close:
+        weights[n.example["label"]] += n.similarity
+    label, weight = max(weights.items(), key=lambda kv: kv[1])
+    agreement = weight / sum(weights.values())
+    backers = sum(1 for n in close if n.example["label"] == label)
+    if agreement >= min_agreement and backers >= 2:
+        return label, round(agreement, 2)
+    return None, round(agreement, 2)
+
+
+def format_examples(neighbors: Sequence[Neighbor]) -> str:
+    """Same line format as `select_examples`, most similar first."""
+    lines = []
+    for n in neighbors:
+        e = n.example
+        snippet_short = (e.get("snippet") or "")[:160].replace("\n", " ")
+        lines.append(f"{e['url']} → {e['label']} | {snippet_short}...")
+    return "\n".join(lines)
+
+
+def _text(example: dict) -> str:
+    return f"{example['url']}\n{example.get('snippet') or ''}"
+
+
+_index: ExampleIndex | None = None
+
+
+def get_example_index() -> ExampleIndex:
+    global _index
+    if _index is None:
+        _index = ExampleIndex()
+    return _index
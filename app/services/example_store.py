@@ -0,0 +1,150 @@
+"""Append-only store for the site classifier's labelled examples.
+
+Each example is one JSON line in CLASSIFIER_EXAMPLES_PATH. Saving appends a
+single line (O(1)); `refresh()` reads only the bytes other processes have
+appended since the last read, so concurrent workers share what they learn.
+Later lines win for the same URL. Duplicates only come from workers
+racing to save the same URL, so nothing compacts automatically;
+`compact()` is a maintenance call that rewrites the file with one line per
+URL and swaps it in atomically (readers notice the swap and reload). Run
+it while no worker is saving: a line appended during the swap is lost.
+
+On first use an existing `classified_sites.json` (the old whole-file
+format) is imported once.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import (
+    CLASSIFIER_EXAMPLES_PATH,
+    DATA_FILE,
+)
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExampleStore:
+    def __init__(self, path: Path | str = CLASSIFIER_EXAMPLES_PATH, legacy_path: Path | str | None = DATA_FILE):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._entries: Dict[str, dict] = {}
+        self._lines = 0
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._import_legacy()
+
+    # -- reads -----------------------------------------------------------
+
+    def refresh(self) -> None:
+        """Pick up lines appended since the last read (or reload after a compaction)."""
+        with self._lock:
+            self._refresh_locked()
+
+    def examples(self) -> List[dict]:
+        self.refresh()
+        return list(self._entries.values())
+
+    def label(self, url: str) -> Optional[str]:
+        self.refresh()
+        entry = self._entries.get(url)
+        return entry["label"] if entry else None
+
+    def _refresh_locked(self) -> None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # first read, or the file was compacted/replaced underneath us
+            self._entries, self._lines, self._offset, self._inode = {}, 0, 0, stat.st_ino
+        if stat.st_size == self._offset:
+            return
+
+        with self.path.open("rb") as fh:
+            fh.seek(self._offset)
+            chunk = fh.read()
+        # a writer may be mid-line; leave the partial tail for the next refresh
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        for raw in complete.splitlines():
+            if not raw.strip():
+                continue
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt example line in %s", self.path)
+                continue
+            self._entries[entry["url"]] = entry
+            self._lines += 1
+        self._offset += len(complete)
+
+    # -- writes ----------------------------------------------------------
+
+    def add(self, url: str, label: str, snippet: str) -> bool:
+        """Append one example; returns False if the URL is already known."""
+        with self._lock:
+            self._refresh_locked()
+            if url in self._entries:
+                return False
+            entry = {"url": url, "label": label, "snippet": snippet}
+            self._append(entry)
+            # our own line is read back by the next refresh; index it now so lookups don't wait
+            self._entries[url] = entry
+        return True
+
+    def _append(self, entry: dict) -> None:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        # one O_APPEND write per line, so concurrent writers don't interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def compact(self) -> None:
+        """Rewrite the file with the latest line per URL and atomically replace it."""
+        with self._lock:
+            self._refresh_locked()
+            tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+            with tmp.open("w", encoding="utf-8") as fh:
+                for entry in self._entries.values():
+                    fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            before = self._lines
+            os.replace(tmp, self.path)
+            # force a full re-read: the next refresh sees the new inode
+            self._inode = None
+            self._refresh_locked()
+            logger.info("Compacted %s: %d lines -> %d", self.path, before, self._lines)
+
+    def _import_legacy(self) -> None:
+        if self.path.exists() or not self.legacy_path or not self.legacy_path.exists():
+            return
+        try:
+            legacy = json.loads(self.legacy_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            logger.warning("Could not import legacy examples from %s", self.legacy_path)
+            return
+        tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            for entry in legacy:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        logger.info("Imported %d examples from %s into %s", len(legacy), self.legacy_path, self.path)
+
+
+_store: ExampleStore | None = None
+
+
+def get_example_store() -> ExampleStore:
+    global _store
+    if _store is None:
+        _store = ExampleStore()
+    return _store
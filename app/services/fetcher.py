@@ -5,7 +5,10 @@ from playwright.async_api import async_playwright
 from app.core.logger import get_logger
 from playwright_stealth import Stealth
 from pathlib import Path
-import traceback, asyncio
+import traceback, asyncio, json
+from urllib.parse import urlparse
+
+import httpx
 
 # from bs4 import BeautifulSoup
 from typing import Optional
@@ -22,22 +25,33 @@ session_store = SessionStore()
 
 _playwright = None
 _browser = None
+# pipeline steps start the browser concurrently; only the first one may launch it
+_launch_lock = asyncio.Lock()
 
 async def _get_playwright():
     global _playwright
-    if _playwright is None:
-        _playwright = await async_playwright().start()
+    async with _launch_lock:
+        if _playwright is None:
+            _playwright = await async_playwright().start()
     return _playwright
 
-async def _create_stealth_context(playwright, storage_state_path: Optional[str] = None, block_media: bool = True):
+async def _get_browser(playwright):
     global _browser
-    if _browser is None:
-        _browser = await playwright.chromium.launch(
-            headless=True,
-            args=BROWSER_ARGS,
-            channel="chrome",
-        )
-    browser = _browser
+    async with _launch_lock:
+        if _browser is None:
+            _browser = await playwright.chromium.launch(
+                headless=True,
+                args=BROWSER_ARGS,
+                channel="chrome",
+            )
+    return _browser
+
+async def warm_up_browser() -> None:
+    """Start Playwright and launch the shared browser ahead of the first navigation."""
+    await _get_browser(await _get_playwright())
+
+async def _create_stealth_context(playwright, storage_state_path: Optional[str] = None, block_media: bool = True):
+    browser = await _get_browser(playwright)
 
     context_kwargs = {
         "viewport": VIEWPORT,
@@ -165,7 +179,7 @@ async def fetch_html(
         storage_state = await context.storage_state()
         await context.close()
 
-        captcha_manager.handle(url, html)
+        await captcha_manager.ahandle(url, html)
         session_store.save(url, storage_state) if storage_state else None
         return html
 
@@ -196,3 +210,59 @@ async def fetch_html(
         logger.error(traceback.format_exc())
         return ""
 
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+            follow_redirects=True,
+        )
+    return _http_client
+
+def _session_cookie_header(url: str) -> Optional[str]:
+    """Cookies from the browser session stored for this host, so plain requests look like the same visitor."""
+    if not session_store.has(url):
+        return None
+    try:
+        state = json.loads(Path(session_store.storage_state_path(url)).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    host = urlparse(url).hostname or ""
+    pairs = [
+        f"{c['name']}={c['value']}"
+        for c in state.get("cookies", [])
+        if c.get("name") and host.endswith(c.get("domain", "").lstrip("."))
+    ]
+    return "; ".join(pairs) or None
+
+async def fetch_raw_html(url: str, *, timeout: float = 15.0) -> str:
+    """
+    Server response over plain HTTP, without rendering. Returns "" on errors,
+    non-HTML responses and bot checks; callers fall back to `fetch_html`.
+    """
+    headers = {}
+    if cookie := _session_cookie_header(url):
+        headers["Cookie"] = cookie
+    try:
+        logger.info("Fetching html over plain HTTP: %s", url)
+        response = await _get_http_client().get(url, headers=headers, timeout=timeout)
+    except httpx.HTTPError as e:
+        logger.info("Plain HTTP fetch failed for %s: %r", url, e)
+        return ""
+
+    if response.status_code != 200 or "html" not in response.headers.get("content-type", "text/html"):
+        logger.info("Plain HTTP fetch of %s returned %s %s", url, response.status_code,
+                    response.headers.get("content-type", ""))
+        return ""
+    html = response.text
+    if captcha_manager.detect(html):
+        logger.info("Plain HTTP response for %s is a bot check; leaving it to the browser", url)
+        return ""
+    return html
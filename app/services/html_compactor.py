@@ -0,0 +1,132 @@
+"""Shrink HTML before it goes into an LLM prompt."""
+
+from __future__ import annotations
+
+import re
+from typing import List, Sequence
+
+from bs4 import BeautifulSoup, Comment, Tag
+
+from app.core.config import CHARS_PER_TOKEN, COMPACT_DROP_TAGS, COMPACT_KEEP_ATTRS
+
+MAX_ATTR_CHARS = 80
+MAX_CLASS_TOKENS = 4
+MIN_FILL_CHARS = 200  # skip the page-context filler when less than this is left
+
+_WS_RE = re.compile(r"\s+")
+_BETWEEN_TAGS_RE = re.compile(r">\s+<")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clean_attr(name: str, value: object) -> str | None:
+    if isinstance(value, (list, tuple)):
+        tokens = [v for v in value if v]
+        if name == "class":
+            tokens = tokens[:MAX_CLASS_TOKENS]
+        value = " ".join(tokens)
+    value = str(value).strip()
+    if not value:
+        return None
+    if value.startswith("data:"):
+        return "data:..."
+    if name in ("href", "src", "action"):
+        value = value.split("?", 1)[0] if len(value) > MAX_ATTR_CHARS else value
+    return value[:MAX_ATTR_CHARS]
+
+
+def _strip(soup: BeautifulSoup) -> None:
+    for node in soup.find_all(COMPACT_DROP_TAGS):
+        node.decompose()
+    for node in soup.find_all("input", attrs={"type": "hidden"}):
+        node.decompose()
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for node in soup.find_all(True):
+        kept = {}
+        for name, value in node.attrs.items():
+            if name not in COMPACT_KEEP_ATTRS:
+                continue
+            cleaned = _clean_attr(name, value)
+            if cleaned is not None:
+                kept[name] = cleaned
+        node.attrs = kept
+
+
+def _render(node: Tag, *, inner: bool = False) -> str:
+    markup = node.decode_contents() if inner else str(node)
+    return _BETWEEN_TAGS_RE.sub("><", _WS_RE.sub(" ", markup)).strip()
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    return text[: max_tokens * CHARS_PER_TOKEN]
+
+
+def compact_html(html: str, *, max_tokens: int, focus: Sequence[str] = ()) -> str:
+    """
+    Strip scripts, styles, SVG, tracking attributes and data URIs, collapse
+    whitespace, then pack the `focus` regions (in priority order) into the
+    token budget before filling what is left with the rest of the page.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    _strip(soup)
+    root = soup.body or soup
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    pieces: List[str] = []
+    taken: set[int] = set()
+    used = 0
+
+    for selector in focus:
+        for node in root.select(selector):
+            if id(node) in taken or any(id(parent) in taken for parent in node.parents):
+                continue
+            if any(id(child) in taken for child in node.descendants):
+                continue
+            rendered = _render(node)
+            if not rendered or used + len(rendered) + 1 > budget:
+                continue
+            pieces.append(rendered)
+            taken.add(id(node))
+            used += len(rendered) + 1
+
+    if not pieces:
+        return _truncate(_render(root, inner=True), max_tokens)
+
+    remaining = budget - used
+    if remaining > MIN_FILL_CHARS:
+        for node in [n for n in root.find_all(True) if id(n) in taken]:
+            node.decompose()
+        pieces.append(_render(root, inner=True)[:remaining])
+    return "\n".join(pieces)
+
+
+def compact_text(html: str, *, max_tokens: int) -> str:
+    """
+    Page text for classification: title, meta description, headings and
+    navigation labels first, then body copy, within the token budget.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    parts: List[str] = []
+
+    if soup.title and soup.title.string:
+        parts.append(soup.title.string)
+    for meta in soup.select("meta[name='description'], meta[property='og:type'], meta[property='og:site_name']"):
+        if meta.get("content"):
+            parts.append(meta["content"])
+
+    _strip(soup)
+    for node in soup.select("h1, h2, h3, nav a"):
+        parts.append(node.get_text(" ", strip=True))
+    parts.append((soup.body or soup).get_text(" ", strip=True))
+
+    seen: set[str] = set()
+    unique: List[str] = []
+    for part in parts:
+        part = _WS_RE.sub(" ", part).strip()
+        if part and part not in seen:
+            seen.add(part)
+            unique.append(part)
+    return _truncate(" | ".join(unique), max_tokens)
@@ -0,0 +1,193 @@
+"""Deterministic search-intent parser for the common shopping instructions.
+
+`parse_search_intent(instruction)` pulls prices, storage/size units,
+colors, brands and rating thresholds out of the instruction with regexes,
+keeps whatever is left as the keyword, and returns a `SearchIntentSchema`
+plus a confidence in [0, 1]. Callers go to the LLM when the confidence is
+below SEARCH_INTENT_RULE_MIN_CONFIDENCE.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Tuple
+
+from app.services.chains.models import SearchConditionModel, SearchIntentSchema
+
+CURRENCIES = {
+    "$": "$", "usd": "$", "dollar": "$", "dollars": "$",
+    "€": "€", "eur": "€", "euro": "€", "euros": "€",
+    "£": "£", "gbp": "£", "pound": "£", "pounds": "£",
+    "mad": "MAD", "dh": "MAD", "dhs": "MAD", "dirham": "MAD", "dirhams": "MAD",
+}
+COLORS = (
+    "black", "white", "silver", "gray", "grey", "gold", "rose gold", "space gray", "red", "blue",
+    "navy", "green", "yellow", "orange", "pink", "purple", "violet", "brown", "beige", "midnight",
+    "starlight", "titanium",
+)
+BRANDS = (
+    "apple", "samsung", "xiaomi", "huawei", "google", "oneplus", "oppo", "sony", "lg", "nokia",
+    "motorola", "dell", "hp", "lenovo", "asus", "acer", "msi", "microsoft", "nike", "adidas",
+    "puma", "zara", "logitech", "bose", "jbl", "canon", "nikon", "dyson", "philips",
+)
+FILLER = {
+    "i", "want", "need", "would", "like", "to", "buy", "find", "search", "for", "looking", "look",
+    "show", "me", "get", "please", "a", "an", "some", "the", "with", "in", "and", "of", "color",
+    "colour", "that", "is", "costs", "cost", "priced", "price", "at", "it", "which", "has", "brand",
+    "by", "from", "storage", "capacity", "version", "model",
+}
+# words the regexes don't understand; their presence means the LLM should decide
+AMBIGUOUS = {
+    "not", "no", "without", "except", "but", "or", "cheapest", "cheap", "best", "similar", "compatible",
+    "near", "delivery", "shipping", "ships", "used", "refurbished", "new", "sale", "discount", "deal",
+    "vs", "versus", "instead",
+}
+
+# grouped thousands ("1,299", "1.299,99", "12,000.50") before plain decimals ("19,99", "10.5")
+_NUM = r"(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?(?!\d)|\d+(?:[.,]\d+)?)\s*(k)?"
+# "1.299" is 1299 in most of Europe but could be a decimal: parsed as thousands, left to the LLM to confirm
+AMBIGUOUS_NUMBER_RE = re.compile(r"(?<![\d.,])\d{1,3}\.\d{3}(?![\d.,])")
+# longer spellings first so "euros" is not read as "eur" + "os"
+_CUR = r"(\$|€|£|usd|euros?|eur|gbp|pounds?|dollars?|dirhams?|dhs?|mad)(?![a-z])"
+_CUR_OPT = rf"(?:{_CUR}\s*)?{_NUM}\s*(?:{_CUR})?"
+
+PRICE_RANGE_RE = re.compile(rf"\b(?:between|from)\s+{_CUR_OPT}\s+(?:and|to|-)\s+{_CUR_OPT}", re.I)
+PRICE_DASH_RE = re.compile(rf"(?:{_CUR}\s*)?{_NUM}\s*-\s*{_NUM}\s*{_CUR}", re.I)
+PRICE_MAX_RE = re.compile(
+    rf"(?:\bunder|\bbelow|\bless than|\bmax(?:imum)?|\bup to|\bat most|\bcheaper than|<=?)\s*{_CUR_OPT}", re.I
+)
+PRICE_MIN_RE = re.compile(
+    rf"(?:\bover|\babove|\bmore than|\bat least|\bmin(?:imum)?|\bstarting at|>=?)\s*{_CUR_OPT}", re.I
+)
+# French "go"/"to" only when glued to the number, so "from 300 to 500" stays a price range
+STORAGE_RE = re.compile(r"\b(\d+(?:\.\d+)?)(\s*gb|\s*tb|go|to)\b(\s*(?:of\s+)?ram\b)?", re.I)
+SCREEN_RE = re.compile(r"\b(\d{1,2}(?:\.\d)?)\s*(?:\"|''|-?inch(?:es)?\b|in\b(?=\s*(?:screen|display|tv|laptop)))", re.I)
+CLOTHING_SIZE_RE = re.compile(r"\bsize\s+(xxs|xs|s|m|l|xl|xxl|xxxl|\d{1,2}(?:\.5)?)\b", re.I)
+RATING_RE = re.compile(
+    r"(?:\brated\s+|\brating\s+(?:of\s+|above\s+|over\s+|at least\s+)?|\bat least\s+)?"
+    r"(\d(?:\.\d)?)\s*(?:\+\s*)?(?:stars?|★)(?:\s+(?:and\s+)?(?:up|above|or more))?",
+    re.I,
+)
+
+
+def normalize_instruction(instruction: str) -> str:
+    """Lowercase, collapse whitespace and trim punctuation; used as the memo key."""
+    text = re.sub(r"\s+", " ", instruction.strip().lower())
+    return text.strip(" .!?,;")
+
+
+def parse_search_intent(instruction: str) -> Tuple[SearchIntentSchema, float]:
+    text = normalize_instruction(instruction)
+    conditions: List[SearchConditionModel] = []
+
+    def add(name: str, value: str) -> None:
+        conditions.append(SearchConditionModel(name=name, value=value))
+
+    # units before prices: "at least 4 stars" or "up to 2tb" must not read as a price
+    for match in RATING_RE.finditer(text):
+        add("rating_min", f"{_number(match.group(1))}+ stars")
+    text = RATING_RE.sub(" ", text)
+
+    for match in STORAGE_RE.finditer(text):
+        unit = match.group(2).strip().lower()
+        unit = {"go": "GB", "to": "TB"}.get(unit, unit.upper())
+        add("ram" if match.group(3) else "storage", f"{_number(match.group(1))}{unit}")
+    text = STORAGE_RE.sub(" ", text)
+
+    for match in SCREEN_RE.finditer(text):
+        add("screen_size", f'{_number(match.group(1))}"')
+    text = SCREEN_RE.sub(" ", text)
+
+    for match in CLOTHING_SIZE_RE.finditer(text):
+        add("size", match.group(1).upper())
+    text = CLOTHING_SIZE_RE.sub(" ", text)
+
+    text = _extract_prices(text, add)
+
+    text = _extract_words(text, COLORS, "color", add)
+    text = _extract_words(text, BRANDS, "brand", add)
+
+    tokens = re.findall(r"[\w+#.-]+", text)
+    ambiguous = [t for t in tokens if t in AMBIGUOUS]
+    keyword_tokens = [t.strip(".-") for t in tokens if t not in FILLER and t not in AMBIGUOUS]
+    keyword = " ".join(t for t in keyword_tokens if t)
+
+    intent = SearchIntentSchema(keyword=keyword or "udgu", conditions=conditions)
+    return intent, _confidence(keyword_tokens, ambiguous, instruction)
+
+
+def _extract_prices(text: str, add) -> str:
+    for match in PRICE_RANGE_RE.finditer(text):
+        g = match.groups()
+        currency = _currency(g[0], g[3], g[4], g[7])
+        add("price_min", _price(g[1], g[2], currency))
+        add("price_max", _price(g[5], g[6], currency))
+    text = PRICE_RANGE_RE.sub(" ", text)
+
+    for match in PRICE_DASH_RE.finditer(text):
+        g = match.groups()
+        currency = _currency(g[0], g[5])
+        add("price_min", _price(g[1], g[2], currency))
+        add("price_max", _price(g[3], g[4], currency))
+    text = PRICE_DASH_RE.sub(" ", text)
+
+    for name, pattern in (("price_max", PRICE_MAX_RE), ("price_min", PRICE_MIN_RE)):
+        def bound(match: re.Match, name: str = name) -> str:
+            g = match.groups()
+            currency = _currency(g[0], g[3])
+            # "max"/"min" without a currency is usually part of a product name ("air max 90")
+            if not currency and match.group(0).lstrip().startswith("m"):
+                return match.group(0)
+            add(name, _price(g[1], g[2], currency))
+            return " "
+
+        text = pattern.sub(bound, text)
+    return text
+
+
+def _extract_words(text: str, words: Tuple[str, ...], name: str, add) -> str:
+    # longest first so "rose gold" wins over "gold"
+    for word in sorted(words, key=len, reverse=True):
+        pattern = re.compile(rf"\b{re.escape(word)}\b")
+        if pattern.search(text):
+            add(name, word)
+            text = pattern.sub(" ", text)
+    return text
+
+
+def _confidence(keyword_tokens: List[str], ambiguous: List[str], instruction: str) -> float:
+    if not keyword_tokens:
+        return 0.0
+    score = 0.95
+    score -= 0.15 * max(0, len(keyword_tokens) - 4)   # long leftovers usually hide unparsed conditions
+    score -= 0.4 * bool(ambiguous)
+    score -= 0.2 * ("?" in instruction or len(instruction.split()) > 15)
+    score -= 0.3 * bool(AMBIGUOUS_NUMBER_RE.search(instruction))
+    return round(max(0.0, min(1.0, score)), 2)
+
+
+def _currency(*candidates) -> str:
+    for cand in candidates:
+        if cand:
+            return CURRENCIES.get(cand.lower(), cand)
+    return ""
+
+
+def _price(number: str, thousands: str | None, currency: str) -> str:
+    value = _amount(number)
+    if thousands:
+        value *= 1000
+    return f"{_number(str(value))}{currency}"
+
+
+def _amount(raw: str) -> float:
+    """Price amount with thousands separators removed; only a 1-2 digit tail is decimal."""
+    head, sep, tail = re.match(r"(.*?)(?:([.,])(\d{1,2}))?$", raw).groups()
+    if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", head):
+        head = re.sub(r"[.,]", "", head)
+    return float(f"{head}.{tail}" if sep else head.replace(",", "."))
+
+
+def _number(raw: str) -> str:
+    value = float(raw.replace(",", "."))
+    return str(int(value)) if value.is_integer() else str(value)
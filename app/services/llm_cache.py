@@ -0,0 +1,203 @@
+"""Persistent SQLite cache for LLM responses, shared by every chain.
+
+The model call is cached before any output parser runs, so a caller that
+rejects the reply opens a `track_keys()` scope around the call and passes
+the keys it collected to `forget()`; otherwise the unparseable reply
+would be served again until it expires.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from app.core.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+)
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# keys read or written inside the current `track_keys()` scope; a list shared
+# by reference, so copied contexts (executors, runnable steps) append to it too
+_touched_keys: ContextVar[Optional[List[str]]] = ContextVar("llm_cache_touched_keys", default=None)
+
+
+@contextmanager
+def track_keys() -> Iterator[List[str]]:
+    keys: List[str] = []
+    token = _touched_keys.set(keys)
+    try:
+        yield keys
+    finally:
+        _touched_keys.reset(token)
+
+
+def _touch(key: str) -> None:
+    keys = _touched_keys.get()
+    if keys is not None:
+        keys.append(key)
+
+
+def _dump_generation(gen: Generation) -> dict:
+    if isinstance(gen, ChatGeneration):
+        return {"message": message_to_dict(gen.message), "generation_info": gen.generation_info}
+    return {"text": gen.text, "generation_info": gen.generation_info}
+
+
+def _load_generation(data: dict) -> Generation:
+    if "message" in data:
+        (message,) = messages_from_dict([data["message"]])
+        return ChatGeneration(message=message, generation_info=data.get("generation_info"))
+    return Generation(text=data["text"], generation_info=data.get("generation_info"))
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain cache backed by a local SQLite file.
+
+    Entries are keyed by a hash of LangChain's `llm_string` (provider, model,
+    temperature and any bound parameters such as function schemas) plus the
+    prompt. Entries older than `ttl_seconds` are ignored and dropped; once
+    more than `max_entries` are stored, the least recently used go first.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = LLM_CACHE_PATH,
+        *,
+        ttl_seconds: Optional[int] = LLM_CACHE_TTL_SECONDS,
+        max_entries: Optional[int] = LLM_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " llm_hash TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return f"{self._hash(llm_string)}:{self._hash(prompt)}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        _touch(key)
+
+        try:
+            return [_load_generation(item) for item in json.loads(row[0])]
+        except Exception as exc:
+            logger.warning("Dropping unreadable LLM cache entry: %s", exc)
+            with self._lock:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        payload = json.dumps([_dump_generation(gen) for gen in return_val])
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_hash, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, self._hash(llm_string), payload, now, now),
+            )
+            self._evict()
+        _touch(key)
+
+    def forget(self, keys: Sequence[str]) -> None:
+        """Drop entries whose reply was rejected downstream (e.g. it didn't parse)."""
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k in set(keys)])
+        self.evictions += len(set(keys))
+
+    def _evict(self) -> None:
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN"
+            " (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+            (overflow,),
+        )
+        self.evictions += overflow
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+
+_llm_cache: Optional[SQLiteLLMCache] = None
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Process-wide cache instance, or None when LLM_CACHE_ENABLED is off."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = SQLiteLLMCache()
+        logger.info("LLM response cache at %s", _llm_cache.path)
+    return _llm_cache
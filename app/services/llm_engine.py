@@ -1,22 +1,75 @@
 # llm_engine.py
 
+import threading
+
 from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 from langchain_groq import ChatGroq
+from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
-from app.core.config import GROQ_API_KEY, DEFAULT_MODEL, DEFAULT_PROVIDER
+import httpx
+
+from app.core.config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    LLM_PROVIDER_TIMEOUTS,
+    OLLAMA_BASE_URL,
+)
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_scheduler import AsyncScheduledTransport, ScheduledTransport, get_scheduler
+
+
+# providers whose HTTP goes through the LLMScheduler (they apply `llm_timeout` after queueing)
+SCHEDULED_PROVIDERS = ("groq",)
+
+_clients: dict = {}  # (provider, model) -> client; reused so its HTTP connection pool is too
+_clients_lock = threading.Lock()
 
 
 def get_llm(provider: str = DEFAULT_PROVIDER, model: str = DEFAULT_MODEL):
+    key = (provider, model)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        if provider == "groq":
+            logger.info(f"Using Groq model: {model}")
+            scheduler = get_scheduler()
+            client = ChatGroq(
+                model=model,
+                temperature=0,
+                api_key=GROQ_API_KEY,
+                base_url=GROQ_BASE_URL,
+                timeout=LLM_PROVIDER_TIMEOUTS.get("groq"),
+                cache=get_llm_cache(),
+                # retries and back-off are the scheduler's job, not the SDK's
+                max_retries=0,
+                http_client=httpx.Client(transport=ScheduledTransport(scheduler)),
+                http_async_client=httpx.AsyncClient(transport=AsyncScheduledTransport(scheduler)),
+            )
+        elif provider == "ollama":
+            logger.info(f"Using local Ollama model: {model}")
+            client = ChatOllama(
+                model=model,
+                temperature=0,
+                base_url=OLLAMA_BASE_URL,
+                cache=get_llm_cache(),
+                client_kwargs={"timeout": LLM_PROVIDER_TIMEOUTS.get("ollama")},
+            )
+        else:
+            raise ValueError(f"Unsupported LLM provider '{provider}'")
 
-    if provider == "groq":
-        logger.info(f"Using Groq model: {model}")
-        return ChatGroq(model=model, temperature=0, api_key=GROQ_API_KEY)
-    else:
-        logger.info(f"We only provide groq model for now: {model}")
-        return ""
+        _clients[key] = client
+        return client
     
 def build_prompt(user_instraction: str, chunks: list) -> str:
     """
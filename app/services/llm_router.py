@@ -0,0 +1,193 @@
+"""Route each LLM task to an ordered list of provider/model targets.
+
+`route_llm(task)` returns a runnable that behaves like a chat model: it
+tries the task's targets from LLM_ROUTES in order, skipping targets that
+failed recently and moving slow ones to the back, and records per-target
+latency so `router_stats()` can show where time goes.
+
+Chains with structured output pass their parser to `route_llm`, so a
+reply that doesn't parse counts as that target failing and the next one
+is tried, instead of surfacing after the router has already returned.
+
+The per-provider timeout covers the provider's answer only: for
+scheduled providers it is handed to the transport, which starts it after
+the rate-limit queue grants the request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.output_parsers import BaseOutputParser
+
+from app.core.config import (
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    LLM_PROVIDER_COOLDOWN_SECONDS,
+    LLM_PROVIDER_TIMEOUTS,
+    LLM_ROUTES,
+    LLM_SLOW_LATENCY_SECONDS,
+)
+from app.core.logger import get_logger
+from app.services.llm_cache import get_llm_cache, track_keys
+from app.services.llm_engine import SCHEDULED_PROVIDERS, get_llm
+from app.services.llm_scheduler import llm_timeout
+
+logger = get_logger(__name__)
+
+Target = Tuple[str, str]  # (provider, model)
+
+EWMA_ALPHA = 0.3
+
+
+@dataclass
+class TargetStats:
+    calls: int = 0
+    failures: int = 0
+    ewma_latency: Optional[float] = None
+    last_failure_at: float = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        if ok:
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+            )
+        else:
+            self.failures += 1
+            self.last_failure_at = time.monotonic()
+
+
+_stats: Dict[Target, TargetStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(target: Target, latency: float, ok: bool) -> None:
+    with _stats_lock:
+        _stats.setdefault(target, TargetStats()).record(latency, ok)
+
+
+def _ordered(targets: List[Target]) -> List[Target]:
+    now = time.monotonic()
+    healthy, slow, cooling = [], [], []
+    with _stats_lock:
+        for target in targets:
+            stats = _stats.get(target)
+            if stats and stats.failures and now - stats.last_failure_at < LLM_PROVIDER_COOLDOWN_SECONDS:
+                cooling.append(target)
+            elif stats and stats.ewma_latency and stats.ewma_latency > LLM_SLOW_LATENCY_SECONDS:
+                slow.append(target)
+            else:
+                healthy.append(target)
+    # cooling targets stay as a last resort so a task never has nowhere to go
+    return healthy + slow + cooling
+
+
+def router_stats() -> Dict[str, dict]:
+    with _stats_lock:
+        return {
+            f"{provider}:{model}": {
+                "calls": s.calls,
+                "failures": s.failures,
+                "ewma_latency_s": round(s.ewma_latency, 3) if s.ewma_latency is not None else None,
+            }
+            for (provider, model), s in _stats.items()
+        }
+
+
+def _forget(cache_keys: List[str]) -> None:
+    """A cached reply that failed (didn't parse) must not be served again to this target."""
+    cache = get_llm_cache()
+    if cache is not None and cache_keys:
+        cache.forget(cache_keys)
+        logger.info("Evicted %d LLM cache entries after a failed reply", len(cache_keys))
+
+
+class RoutedModel(Runnable):
+    """Chat-model stand-in that falls back across the task's targets."""
+
+    def __init__(self, task: str, targets: List[Target], parser: Optional[BaseOutputParser] = None) -> None:
+        self.task = task
+        self.targets = targets
+        self.parser = parser
+
+    def _unit(self, llm, kwargs: dict) -> Runnable:
+        """What one target runs: the model (with any bound kwargs) and, if set, the parser."""
+        bound = llm.bind(**kwargs) if kwargs else llm
+        return bound | self.parser if self.parser is not None else bound
+
+    def _clients(self):
+        for target in _ordered(self.targets):
+            try:
+                yield target, get_llm(*target)
+            except Exception as exc:  # e.g. missing API key for that provider
+                logger.warning("LLM target %s:%s unavailable: %s", *target, exc)
+                _record(target, 0.0, ok=False)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        last_error: Optional[Exception] = None
+        for target, llm in self._clients():
+            started = time.monotonic()
+            try:
+                with track_keys() as cache_keys:
+                    result = self._unit(llm, kwargs).invoke(input, config)
+            except Exception as exc:
+                _forget(cache_keys)
+                _record(target, time.monotonic() - started, ok=False)
+                logger.warning("LLM %s:%s failed for %s; trying next target: %s", *target, self.task, exc)
+                last_error = exc
+                continue
+            _record(target, time.monotonic() - started, ok=True)
+            return result
+        raise last_error or RuntimeError(f"No LLM target available for task '{self.task}'")
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        last_error: Optional[Exception] = None
+        for target, llm in self._clients():
+            timeout = LLM_PROVIDER_TIMEOUTS.get(target[0])
+            started = time.monotonic()
+            token = llm_timeout.set(timeout)
+            try:
+                with track_keys() as cache_keys:
+                    call = self._unit(llm, kwargs).ainvoke(input, config)
+                    if target[0] not in SCHEDULED_PROVIDERS:
+                        # nothing queues in front of these, so the whole call is the provider's time
+                        call = asyncio.wait_for(call, timeout=timeout)
+                    result = await call
+            except Exception as exc:
+                _forget(cache_keys)
+                _record(target, time.monotonic() - started, ok=False)
+                logger.warning("LLM %s:%s failed for %s; trying next target: %r", *target, self.task, exc)
+                last_error = exc
+                continue
+            finally:
+                llm_timeout.reset(token)
+            _record(target, time.monotonic() - started, ok=True)
+            return result
+        raise last_error or RuntimeError(f"No LLM target available for task '{self.task}'")
+
+
+def _targets(task: str) -> List[Target]:
+    return [tuple(t) for t in LLM_ROUTES.get(task) or [(DEFAULT_PROVIDER, DEFAULT_MODEL)]]
+
+
+def route_llm(task: str, parser: Optional[BaseOutputParser] = None) -> RoutedModel:
+    return RoutedModel(task, _targets(task), parser)
+
+
+def warm_up(tasks: Iterable[str]) -> List[Target]:
+    """Create the clients of every target the tasks can route to; returns the ones that are ready."""
+    ready: List[Target] = []
+    for target in dict.fromkeys(t for task in tasks for t in _targets(task)):
+        try:
+            get_llm(*target)
+        except Exception as exc:  # the router skips it at call time too
+            logger.warning("LLM target %s:%s unavailable: %s", *target, exc)
+            continue
+        ready.append(target)
+    return ready
@@ -0,0 +1,313 @@
+"""Central rate-limit-aware scheduler for outgoing LLM requests.
+
+Every chat-completion HTTP request made by the shared LLM clients passes
+through `ScheduledTransport` / `AsyncScheduledTransport`, which ask the
+process-wide `LLMScheduler` for a permit first. Cache hits never reach
+HTTP, so they never consume rate budget.
+
+The scheduler keeps two token buckets (requests/minute and
+tokens/minute, the latter from an estimate of the request size), a cap on
+in-flight requests, and a priority queue: the priority of a request comes
+from the `llm_priority` context variable, set by `PrioritizedRunnable`
+around each chain call. A 429 response pauses all traffic for its
+Retry-After and the request is re-queued.
+
+The per-provider timeout (`llm_timeout`, set by the LLM router) starts
+only once a permit is granted, so time spent queueing behind the rate
+limits never turns into a timeout.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import httpx
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.core.config import (
+    CHARS_PER_TOKEN,
+    LLM_COMPLETION_TOKENS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_PRIORITIES,
+    LLM_RPM,
+    LLM_TPM,
+)
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PRIORITY = max(LLM_PRIORITIES.values(), default=0)
+
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+# seconds the provider gets to answer once the request is granted; None = the client's own timeout
+llm_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_timeout", default=None)
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    notify: Callable[[], None] = field(compare=False)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        *,
+        rpm: int = LLM_RPM,
+        tpm: int = LLM_TPM,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._waiters: list[_Ticket] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._timer_due = 0.0
+
+        now = clock()
+        self._req_tokens = float(rpm)
+        self._tok_tokens = float(tpm)
+        self._refilled_at = now
+
+        self.granted = 0
+        self.rate_limited = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ---- bucket bookkeeping (call with the lock held) ----
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        if elapsed > 0:
+            self._req_tokens = min(self.rpm, self._req_tokens + elapsed * self.rpm / 60)
+            self._tok_tokens = min(self.tpm, self._tok_tokens + elapsed * self.tpm / 60)
+            self._refilled_at = now
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        due = self._clock() + delay
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._wakeup)
+        self._timer.daemon = True
+        self._timer_due = due
+        self._timer.start()
+
+    def _wakeup(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._grant()
+
+    def _grant(self) -> None:
+        now = self._clock()
+        self._refill(now)
+        while self._waiters and self._in_flight < self.max_concurrency:
+            if now < self._paused_until:
+                self._schedule_wakeup(self._paused_until - now)
+                return
+            head = self._waiters[0]
+            need = min(head.tokens, self.tpm)
+            if self._req_tokens < 1 or self._tok_tokens < need:
+                delay = max(
+                    (1 - self._req_tokens) * 60 / self.rpm,
+                    (need - self._tok_tokens) * 60 / self.tpm,
+                    0.01,
+                )
+                self._schedule_wakeup(delay)
+                return
+            heapq.heappop(self._waiters)
+            self._req_tokens -= 1
+            self._tok_tokens -= need
+            self._in_flight += 1
+            self.granted += 1
+            waited = now - head.enqueued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            head.notify()
+
+    def _enqueue(self, priority: int, tokens: int, notify: Callable[[], None]) -> _Ticket:
+        ticket = _Ticket(priority, next(self._seq), tokens, self._clock(), notify)
+        heapq.heappush(self._waiters, ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        self._grant()
+        return ticket
+
+    # ---- public API ----
+
+    def acquire(self, priority: int, tokens: int) -> None:
+        granted = threading.Event()
+        with self._lock:
+            self._enqueue(priority, tokens, granted.set)
+        granted.wait()
+
+    async def acquire_async(self, priority: int, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+
+        def deliver() -> None:
+            if fut.cancelled():
+                self.release()  # granted after the waiter went away
+            else:
+                fut.set_result(None)
+
+        with self._lock:
+            ticket = self._enqueue(priority, tokens, lambda: loop.call_soon_threadsafe(deliver))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+            if fut.done() and not fut.cancelled():
+                self.release()  # permit arrived just before the cancellation
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._grant()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued request for `seconds` (server asked us to back off)."""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            logger.warning("LLM rate limited; pausing requests for %.1fs", seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self._in_flight,
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "avg_wait_s": round(self.total_wait / self.granted, 3) if self.granted else 0.0,
+                "max_wait_s": round(self.max_wait, 3),
+            }
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Prompt size from the request body plus the completion we expect back."""
+    size = int(request.headers.get("content-length") or len(request.content or b""))
+    return size // CHARS_PER_TOKEN + LLM_COMPLETION_TOKENS
+
+
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = response.headers.get(header)
+        if not value:
+            continue
+        try:
+            return max(float(value.rstrip("s")), 0.1)
+        except ValueError:
+            continue
+    return float(2 ** attempt)
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    def __init__(self, scheduler: LLMScheduler, inner: Optional[httpx.BaseTransport] = None) -> None:
+        self.scheduler = scheduler
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.scheduler.max_retries + 1):
+            self.scheduler.acquire(llm_priority.get(), tokens)
+            try:
+                response = self.inner.handle_request(request)
+                if response.status_code != 429 or attempt == self.scheduler.max_retries:
+                    return response
+                response.read()
+                response.close()
+                self.scheduler.pause(_retry_after(response, attempt))
+            finally:
+                self.scheduler.release()
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    def __init__(self, scheduler: LLMScheduler, inner: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.scheduler = scheduler
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.scheduler.max_retries + 1):
+            await self.scheduler.acquire_async(llm_priority.get(), tokens)
+            try:
+                try:
+                    response = await asyncio.wait_for(self.inner.handle_async_request(request), llm_timeout.get())
+                except asyncio.TimeoutError:
+                    raise httpx.ReadTimeout("LLM provider did not answer in time", request=request) from None
+                if response.status_code != 429 or attempt == self.scheduler.max_retries:
+                    return response
+                await response.aread()
+                await response.aclose()
+                self.scheduler.pause(_retry_after(response, attempt))
+            finally:
+                self.scheduler.release()
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class PrioritizedRunnable(Runnable):
+    """Run a chain with `llm_priority` set, so its LLM requests queue in that class."""
+
+    def __init__(self, chain: Runnable, priority: int) -> None:
+        self.chain = chain
+        self.priority = priority
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        token = llm_priority.set(self.priority)
+        try:
+            return self.chain.invoke(input, config, **kwargs)
+        finally:
+            llm_priority.reset(token)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        token = llm_priority.set(self.priority)
+        try:
+            return await self.chain.ainvoke(input, config, **kwargs)
+        finally:
+            llm_priority.reset(token)
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
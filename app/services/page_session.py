@@ -0,0 +1,110 @@
+"""Run-scoped live page shared by classification, detection and submission.
+
+One agent run used to load the same homepage up to three times
+(classifier fetch, detection fetch, validator `goto`). A `PageSession`
+loads it once: `html()` returns the homepage HTML to every reader, and
+`take_page()` hands the still-open page to the one consumer that will
+type into it (the validator), which then owns and closes it.
+
+If the load hits a captcha, the session falls back to `fetch_html`'s full
+captcha flow for the HTML and has no live page to hand out; the validator
+then opens its own as before.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from playwright.async_api import BrowserContext, Page
+
+from app.core.config import PAGE_SESSION_TIMEOUT_MS, PAGE_SESSION_WAIT_MS
+from app.core.logger import get_logger
+from app.services.captcha_manager import CaptchaDetected
+from app.services.fetcher import (
+    _create_stealth_context,
+    _get_playwright,
+    captcha_manager,
+    fetch_html,
+    session_store,
+)
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PageSession:
+    url: str
+    wait_ms: int = PAGE_SESSION_WAIT_MS
+    timeout_ms: int = PAGE_SESSION_TIMEOUT_MS
+    _context: Optional[BrowserContext] = None
+    _page: Optional[Page] = None
+    _html: Optional[str] = None
+    _loaded: bool = False
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    async def html(self) -> str:
+        """Homepage HTML; the first caller loads the page, later callers reuse it."""
+        async with self._lock:
+            if not self._loaded:
+                self._html = await self._load()
+                self._loaded = True
+        return self._html or ""
+
+    async def take_page(self) -> Optional[Tuple[BrowserContext, Page]]:
+        """
+        Hand the loaded page to a consumer that will interact with it (and
+        close its context). Returns None if there is no untouched live page.
+        """
+        await self.html()
+        async with self._lock:
+            if self._page is None or self._page.is_closed():
+                return None
+            handoff = (self._context, self._page)
+            self._context = self._page = None
+            logger.info("Reusing the loaded page for %s", self.url)
+            return handoff
+
+    async def close(self) -> None:
+        async with self._lock:
+            context, self._context, self._page = self._context, None, None
+        await self._discard(context)
+
+    async def _load(self) -> str:
+        storage_state_path = session_store.storage_state_path(self.url)
+        context = None
+        try:
+            logger.info("Loading %s once for this run", self.url)
+            p = await _get_playwright()
+            _, context, page = await _create_stealth_context(
+                p, storage_state_path if session_store.has(self.url) else None
+            )
+            await page.goto(self.url, wait_until="domcontentloaded", timeout=self.timeout_ms)
+            await page.wait_for_timeout(self.wait_ms)
+            html = await page.content()
+            await captcha_manager.ahandle(self.url, html)
+            storage_state = await context.storage_state()
+            if storage_state:
+                session_store.save(self.url, storage_state)
+            self._context, self._page = context, page
+            return html
+        except CaptchaDetected:
+            logger.warning("Captcha on %s; falling back to the fetcher's captcha flow", self.url)
+        except Exception as exc:
+            logger.warning("Shared page load failed for %s (%r); falling back to fetch_html", self.url, exc)
+        except BaseException:
+            # cancelled mid-load (e.g. the run turned out not to need the page)
+            await self._discard(context)
+            raise
+        await self._discard(context)
+        return await fetch_html(self.url, wait=self.wait_ms, timeout=self.timeout_ms)
+
+    @staticmethod
+    async def _discard(context: Optional[BrowserContext]) -> None:
+        if context is None:
+            return
+        try:
+            await context.close()
+        except Exception:
+            logger.warning("Playwright context failed to close cleanly")
@@ -11,11 +11,16 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
-from app.core.config import SEARCH_ATTRS, SEARCH_TERMS
-from app.prompts.prompts import SEARCH_SELECTORS_PROMPT
-from app.services.llm_engine import get_llm
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from app.core.config import (
+    SEARCH_ATTRS,
+    SEARCH_TERMS,
+    SEARCH_FOCUS_SELECTORS,
+    SEARCH_SNIPPET_TOKENS,
+    SEARCH_HEURISTIC_MIN_CONFIDENCE,
+)
+from app.services.chains.registry import get_chain
+from app.services.cpu_pool import run_html_task
+from app.services.html_compactor import compact_html
 
 
 @dataclass
@@ -28,16 +33,9 @@ class SelectorCandidate:
 
 INPUT_TYPE_RE = re.compile(r"search|text", re.I)
 SEARCH_TERMS_RE = SEARCH_TERMS if hasattr(SEARCH_TERMS, "search") else re.compile(SEARCH_TERMS, re.I)
-SNIPPET_LIMIT = 8000
 
-_PROMPT = PromptTemplate.from_template(SEARCH_SELECTORS_PROMPT)
-_STR_PARSER = StrOutputParser()
-_CHAIN = None
 def _get_selector_chain():
-    global _CHAIN
-    if _CHAIN is None:
-        _CHAIN = _PROMPT | get_llm() | _STR_PARSER
-    return _CHAIN
+    return get_chain("search_selectors")
 
 def _attr_tokens(value: object) -> list[str]:
     if value is None:
@@ -56,28 +54,65 @@ def clean_json_text(text: str) -> str:
     return text
 
 
+def detect_search_candidates(html: str, limit: int = 10) -> List[SelectorCandidate]:
+    """
+    Return up to `limit` candidates ranked by confidence. Heuristics run
+    first; the LLM is asked once, and only when no heuristic candidate
+    reaches SEARCH_HEURISTIC_MIN_CONFIDENCE.
+    """
+    heuristic = _detect_search_selectors_heuristic(html, limit)
+    if _heuristic_is_confident(heuristic):
+        return _rank_candidates(heuristic, limit)
+    return _rank_candidates([*heuristic, *_detect_search_selectors_llm(html, limit)], limit)
+
+
 def detect_search_selectors(html: str, limit: int = 10) -> List[str]:
     """
-    Return up to `limit` CSS selectors, ranked by confidence, merged from
-    heuristic and LLM sources.
+    Return up to `limit` CSS selectors, ranked by confidence, from the
+    gated heuristic/LLM detector.
+    """
+    return [cand.css for cand in detect_search_candidates(html, limit)]
+
+
+async def detect_search_candidates_async(html: str, limit: int = 10) -> List[SelectorCandidate]:
+    """
+    Async variant of `detect_search_candidates`: the heuristic parse runs in
+    the process pool and the LLM fallback is awaited natively.
     """
-    candidates: List[SelectorCandidate] = []
-    candidates.extend(_detect_search_selectors_heuristic(html, limit))
-    candidates.extend(_detect_search_selectors_llm(html, limit))
+    heuristic = await run_html_task(_detect_search_selectors_heuristic, html, limit)
+    if _heuristic_is_confident(heuristic):
+        return _rank_candidates(heuristic, limit)
+    llm = await _detect_search_selectors_llm_async(html, limit)
+    return _rank_candidates([*heuristic, *llm], limit)
+
+
+async def detect_search_selectors_async(html: str, limit: int = 10) -> List[str]:
+    return [cand.css for cand in await detect_search_candidates_async(html, limit)]
+
+
+def _heuristic_is_confident(candidates: List[SelectorCandidate]) -> bool:
+    best = max((c.confidence for c in candidates), default=0)
+    if best >= SEARCH_HEURISTIC_MIN_CONFIDENCE:
+        logger.info("Heuristic search selector at confidence %d; skipping LLM", best)
+        return True
+    return False
 
+
+def _rank_candidates(candidates: List[SelectorCandidate], limit: int) -> List[SelectorCandidate]:
+    # stable sort: on equal confidence the heuristic guess stays ahead
     ordered = sorted(candidates, key=lambda c: c.confidence, reverse=True)
     seen: set[str] = set()
-    result: List[str] = []
+    result: List[SelectorCandidate] = []
 
     for cand in ordered:
         if cand.css in seen:
             continue
         seen.add(cand.css)
-        result.append(cand.css)
+        result.append(cand)
         if len(result) >= limit:
             break
 
-    logger.info("Search selector candidates: %s", result)
+    logger.info("Search selector candidates: %s", [(c.css, c.source) for c in result])
     return result
 
 def _detect_search_selectors_heuristic(html: str, limit: int) -> List[SelectorCandidate]:
@@ -108,9 +143,8 @@ def _detect_search_selectors_heuristic(html: str, limit: int) -> List[SelectorCa
     return results
 
 def _detect_search_selectors_llm(html: str, limit: int) -> List[SelectorCandidate]:
-    snippet = html[:SNIPPET_LIMIT]
+    snippet = compact_html(html, max_tokens=SEARCH_SNIPPET_TOKENS, focus=SEARCH_FOCUS_SELECTORS)
     chain = _get_selector_chain()
-    payload_raw = chain.invoke({"snippet": snippet})
 
     try:
         payload_raw = chain.invoke({"snippet": snippet})
@@ -118,7 +152,25 @@ def _detect_search_selectors_llm(html: str, limit: int) -> List[SelectorCandidat
     except json.JSONDecodeError:
         logger.warning("LLM returned non-JSON selector payload.")
         return []
+    return _llm_candidates(payload, limit)
+
+
+async def _detect_search_selectors_llm_async(html: str, limit: int) -> List[SelectorCandidate]:
+    snippet = await run_html_task(
+        compact_html, html, max_tokens=SEARCH_SNIPPET_TOKENS, focus=SEARCH_FOCUS_SELECTORS
+    )
+    chain = _get_selector_chain()
+
+    try:
+        payload_raw = await chain.ainvoke({"snippet": snippet})
+        payload = json.loads(clean_json_text(payload_raw))
+    except json.JSONDecodeError:
+        logger.warning("LLM returned non-JSON selector payload.")
+        return []
+    return _llm_candidates(payload, limit)
+
 
+def _llm_candidates(payload: dict, limit: int) -> List[SelectorCandidate]:
     selectors: List[SelectorCandidate] = []
     for item in payload.get("selectors", [])[:limit]:
         css = (item.get("css") or "").strip()
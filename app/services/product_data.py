@@ -0,0 +1,243 @@
+"""Product fields read from a detail page's structured data.
+
+Shops publish most of what a card needs for search engines: schema.org
+`Product` / `Offer` / `AggregateRating` as JSON-LD or microdata, plus
+OpenGraph `product:*` meta tags. All of it is in the raw server response,
+so `extract_product_data(html, base_url)` fills price, currency,
+availability, brand, rating and review count without rendering the page.
+Sources are merged field by field: JSON-LD, then microdata, then
+OpenGraph. A relative image URL is resolved against `base_url`.
+
+Module-level and log-free so it can run through `run_html_task`.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urljoin
+
+from lxml import etree, html as lxml_html
+
+# what a detail page is expected to provide; anything missing sends the enricher to the browser
+CORE_FIELDS = ("price", "currency", "availability", "brand", "rating", "reviews_count")
+
+PRODUCT_TYPES = {"product", "productgroup", "individualproduct", "productmodel", "vehicle", "book"}
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+OG_FIELDS = {
+    "title": ("og:title",),
+    "image_url": ("og:image", "og:image:secure_url"),
+    "description": ("og:description",),
+    "price": ("product:price:amount", "og:price:amount", "product:sale_price:amount"),
+    "currency": ("product:price:currency", "og:price:currency", "product:sale_price:currency"),
+    "availability": ("product:availability", "og:availability"),
+    "brand": ("product:brand", "og:brand"),
+}
+
+
+def extract_product_data(html: str, base_url: Optional[str] = None) -> Dict[str, Any]:
+    """Card updates found in JSON-LD, microdata and OpenGraph; fields not found are absent."""
+    if not html:
+        return {}
+    try:
+        doc = lxml_html.fromstring(html)
+    except (ValueError, etree.ParserError):
+        return {}
+
+    data: Dict[str, Any] = {}
+    for source in (_from_jsonld(doc), _from_microdata(doc), _from_opengraph(doc)):
+        for key, value in source.items():
+            if value not in (None, "") and key not in data:
+                data[key] = value
+    if "title" in data:
+        data.setdefault("name", data["title"])
+    if base_url and "image_url" in data:
+        data["image_url"] = urljoin(base_url, data["image_url"])
+    return data
+
+
+def missing_fields(data: Dict[str, Any], fields: Iterable[str] = CORE_FIELDS) -> List[str]:
+    return [f for f in fields if data.get(f) in (None, "")]
+
+
+# -- JSON-LD -------------------------------------------------------------
+
+def _from_jsonld(doc) -> Dict[str, Any]:
+    for script in doc.xpath('//script[@type="application/ld+json"]'):
+        try:
+            payload = json.loads(script.text_content() or "")
+        except ValueError:
+            continue
+        product = _find_product(payload)
+        if product is not None:
+            return _product_fields(product)
+    return {}
+
+
+def _find_product(payload) -> Optional[dict]:
+    stack = [payload]
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if _types(node) & PRODUCT_TYPES:
+                return node
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+    return None
+
+
+def _product_fields(product: dict) -> Dict[str, Any]:
+    fields: Dict[str, Any] = {
+        "title": _text(product.get("name")),
+        "description": _text(product.get("description")),
+        "image_url": _image(product.get("image")),
+        "brand": _name(product.get("brand") or product.get("manufacturer")),
+        "model": _text(product.get("model") if isinstance(product.get("model"), str) else product.get("mpn")),
+    }
+
+    offer = _first_offer(product.get("offers"))
+    if offer is None and isinstance(product.get("hasVariant"), list):
+        # ProductGroup: the first variant carrying an offer stands in for the group
+        for variant in product["hasVariant"]:
+            if isinstance(variant, dict) and (offer := _first_offer(variant.get("offers"))):
+                break
+    if offer:
+        spec = offer.get("priceSpecification")
+        spec = spec[0] if isinstance(spec, list) and spec else spec
+        spec = spec if isinstance(spec, dict) else {}
+        price = next(
+            (v for v in (offer.get("price"), offer.get("lowPrice"), spec.get("price")) if v not in (None, "")),
+            None,
+        )
+        fields["price"] = _text(price)
+        fields["currency"] = _text(offer.get("priceCurrency") or spec.get("priceCurrency"))
+        fields["availability"] = _availability(offer.get("availability"))
+        fields["seller"] = _name(offer.get("seller"))
+
+    rating = product.get("aggregateRating")
+    if isinstance(rating, dict):
+        fields["rating"] = parse_float(rating.get("ratingValue"))
+        fields["reviews_count"] = parse_int(rating.get("reviewCount") or rating.get("ratingCount"))
+    return fields
+
+
+def _first_offer(offers) -> Optional[dict]:
+    if isinstance(offers, list):
+        offers = next((o for o in offers if isinstance(o, dict)), None)
+    if not isinstance(offers, dict):
+        return None
+    # AggregateOffer may nest the concrete offers; their fields win, the aggregate fills gaps
+    inner = _first_offer(offers.get("offers")) if isinstance(offers.get("offers"), (list, dict)) else None
+    return {**offers, **inner} if inner else offers
+
+
+# -- microdata -----------------------------------------------------------
+
+def _from_microdata(doc) -> Dict[str, Any]:
+    scopes = [
+        el for el in doc.xpath("//*[@itemscope][@itemtype]")
+        if _types({"@type": el.get("itemtype", "").split()}) & PRODUCT_TYPES
+    ]
+    if not scopes:
+        return {}
+    product = scopes[0]
+    own: Dict[str, str] = {}
+    nested: Dict[str, str] = {}
+    for el in product.xpath(".//*[@itemprop]"):
+        value = (
+            el.get("content") or el.get("href") or el.get("src") or el.get("datetime")
+            or el.text_content()
+        )
+        value = " ".join((value or "").split())
+        # props of nested scopes (offers, rating, brand) only fill gaps: a brand's `name` isn't the product's
+        target = own if _owner_scope(el) is product else nested
+        for name in el.get("itemprop", "").split():
+            target.setdefault(name, value)
+    props = {**nested, **own}
+
+    brand_scope = product.xpath('.//*[@itemprop="brand"]//*[@itemprop="name"]')
+    return {
+        "title": props.get("name"),
+        "description": props.get("description"),
+        "image_url": props.get("image"),
+        "brand": " ".join(brand_scope[0].text_content().split()) if brand_scope else props.get("brand"),
+        "price": props.get("price") or props.get("lowPrice"),
+        "currency": props.get("priceCurrency"),
+        "availability": _availability(props.get("availability")),
+        "rating": parse_float(props.get("ratingValue")),
+        "reviews_count": parse_int(props.get("reviewCount") or props.get("ratingCount")),
+    }
+
+
+def _owner_scope(el):
+    parent = el.getparent()
+    while parent is not None and parent.get("itemscope") is None:
+        parent = parent.getparent()
+    return parent
+
+
+# -- OpenGraph -----------------------------------------------------------
+
+def _from_opengraph(doc) -> Dict[str, Any]:
+    meta = {}
+    for el in doc.xpath("//meta[@property or @name][@content]"):
+        key = (el.get("property") or el.get("name") or "").strip().lower()
+        meta.setdefault(key, el.get("content").strip())
+    fields = {field: next((meta[k] for k in keys if meta.get(k)), None) for field, keys in OG_FIELDS.items()}
+    fields["availability"] = _availability(fields["availability"])
+    return fields
+
+
+# -- value helpers -------------------------------------------------------
+
+def _types(node: dict) -> set:
+    types = node.get("@type")
+    return {
+        t.rsplit("/", 1)[-1].lower()
+        for t in (types if isinstance(types, list) else [types])
+        if isinstance(t, str)
+    }
+
+
+def _text(value) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = " ".join(str(value).split())
+    return text or None
+
+
+def _name(value) -> Optional[str]:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        return _text(value.get("name"))
+    return _text(value)
+
+
+def _image(value) -> Optional[str]:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("contentUrl")
+    return _text(value)
+
+
+def _availability(value) -> Optional[str]:
+    """"https://schema.org/InStock" -> "InStock"; free text is kept as-is."""
+    text = _text(value)
+    return text.rstrip("/").rsplit("/", 1)[-1] if text else None
+
+
+def parse_float(value) -> Optional[float]:
+    """First number in `value` ("4,5 out of 5" -> 4.5)."""
+    match = _NUMBER_RE.search(str(value)) if value is not None else None
+    return float(match.group().replace(",", ".")) if match else None
+
+
+def parse_int(value) -> Optional[int]:
+    """All digits of `value` as one integer ("1,234 ratings" -> 1234)."""
+    digits = re.sub(r"[^\d]", "", str(value)) if value is not None else ""
+    return int(digits) if digits else None
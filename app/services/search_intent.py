@@ -1,20 +1,30 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List
-
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from app.core.config import (
+    SEARCH_INTENT_MEMO_MAX_ENTRIES,
+    SEARCH_INTENT_MEMO_PATH,
+    SEARCH_INTENT_MEMO_SIZE,
+    SEARCH_INTENT_RULE_MIN_CONFIDENCE,
+)
 from app.core.logger import get_logger
-from app.services.chains.builders import build_search_intent_chain
+from app.services.chains.registry import get_chain
 from app.services.chains.models import SearchIntentSchema
+from app.services.intent_rules import normalize_instruction, parse_search_intent
 
 logger = get_logger(__name__)
 
-_search_intent_chain = None  # ← add this
+# conditions that need a UI filter rather than words in the search box
+FILTER_CONDITIONS = {"price_min", "price_max", "rating_min"}
+
 def _get_search_intent_chain():
-    global _search_intent_chain
-    if _search_intent_chain is None:
-        _search_intent_chain = build_search_intent_chain()
-    return _search_intent_chain
+    return get_chain("search_intent")
 
 
 @dataclass
@@ -27,26 +37,164 @@ class SearchCondition:
 class SearchIntent:
     keyword: str
     conditions: List[SearchCondition]
+    confidence: float = 1.0
+    source: str = "llm"   # rules | llm | fallback
+
+
+class SearchIntentMemo:
+    """In-process LRU in front of a JSON file, keyed by the normalized instruction."""
+
+    def __init__(
+        self,
+        path: Path | str = SEARCH_INTENT_MEMO_PATH,
+        size: int = SEARCH_INTENT_MEMO_SIZE,
+        max_entries: int = SEARCH_INTENT_MEMO_MAX_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.size = size
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, SearchIntent] = OrderedDict()
+        self._disk: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[SearchIntent]:
+        with self._lock:
+            intent = self._lru.get(key)
+            if intent is None:
+                raw = self._load().get(key)
+                if raw is None:
+                    return None
+                intent = _intent_from_dict(raw)
+            self._remember(key, intent)
+            return intent
+
+    def set(self, key: str, intent: SearchIntent) -> None:
+        with self._lock:
+            self._remember(key, intent)
+            disk = self._load()
+            disk.pop(key, None)
+            disk[key] = asdict(intent)
+            while len(disk) > self.max_entries:
+                disk.pop(next(iter(disk)))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(disk, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    def _remember(self, key: str, intent: SearchIntent) -> None:
+        self._lru[key] = intent
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def _load(self) -> dict:
+        if self._disk is None:
+            try:
+                self._disk = json.loads(self.path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._disk = {}
+        return self._disk
+
+
+_memo: SearchIntentMemo | None = None
+
+
+def get_search_intent_memo() -> SearchIntentMemo:
+    global _memo
+    if _memo is None:
+        _memo = SearchIntentMemo()
+    return _memo
 
 
 def build_search_intent(instruction: str) -> SearchIntent:
-    chain = _get_search_intent_chain()
     clean_instruction = instruction.strip()
+    key = normalize_instruction(clean_instruction)
+    cached = _from_memo_or_rules(key, clean_instruction)
+    if cached.source != "fallback":
+        return cached
 
+    chain = _get_search_intent_chain()
     logger.info("Requesting search intent from LLM")
     try:
         intent: SearchIntentSchema = chain.invoke({"instruction": clean_instruction})
-        keyword = intent.keyword or "udgu"
-        conditions = [SearchCondition(name=c.name, value=c.value) for c in intent.conditions]
-        return intent
     except Exception as exc:
         logger.error("Search intent parsing failed: %s", exc)
-        return SearchIntent(keyword="udgu", conditions=[clean_instruction])
-    
+        return cached
+    return _remember_llm(key, intent)
+
+
+async def build_search_intent_async(instruction: str) -> SearchIntent:
+    clean_instruction = instruction.strip()
+    key = normalize_instruction(clean_instruction)
+    cached = _from_memo_or_rules(key, clean_instruction)
+    if cached.source != "fallback":
+        return cached
+
+    chain = _get_search_intent_chain()
+    logger.info("Requesting search intent from LLM")
+    try:
+        intent: SearchIntentSchema = await chain.ainvoke({"instruction": clean_instruction})
+    except Exception as exc:
+        logger.error("Search intent parsing failed: %s", exc)
+        return cached
+    return _remember_llm(key, intent)
+
+
+def _from_memo_or_rules(key: str, clean_instruction: str) -> SearchIntent:
+    """
+    Memo hit or confident rule parse; otherwise the intent to fall back on
+    if the LLM fails (source="fallback").
+    """
+    memo = get_search_intent_memo()
+    cached = memo.get(key)
+    if cached is not None:
+        logger.info("Search intent memo hit for '%s'", key)
+        return cached
+
+    schema, confidence = parse_search_intent(clean_instruction)
+    if confidence >= SEARCH_INTENT_RULE_MIN_CONFIDENCE:
+        logger.info("Rule-based search intent at confidence %.2f; skipping LLM", confidence)
+        intent = _intent_from_schema(schema, confidence, "rules")
+        memo.set(key, intent)
+        return intent
+
+    if schema.keyword and schema.keyword.lower() != "udgu":
+        return _intent_from_schema(schema, confidence, "fallback")
+    return SearchIntent(keyword="udgu", conditions=[clean_instruction], confidence=0.0, source="fallback")
+
+
+def _remember_llm(key: str, schema: SearchIntentSchema) -> SearchIntent:
+    intent = _intent_from_schema(schema, 1.0, "llm")
+    get_search_intent_memo().set(key, intent)
+    return intent
+
+
+def _intent_from_schema(schema: SearchIntentSchema, confidence: float, source: str) -> SearchIntent:
+    return SearchIntent(
+        keyword=schema.keyword or "udgu",
+        conditions=[SearchCondition(name=c.name, value=c.value) for c in schema.conditions],
+        confidence=confidence,
+        source=source,
+    )
+
+
+def _intent_from_dict(raw: dict) -> SearchIntent:
+    return SearchIntent(
+        keyword=raw.get("keyword") or "udgu",
+        conditions=[SearchCondition(**c) for c in raw.get("conditions", [])],
+        confidence=raw.get("confidence", 1.0),
+        source=raw.get("source", "llm"),
+    )
+
 
 def build_search_keyword(instruction: str) -> str:
+    return _keyword_from_intent(build_search_intent(instruction))
+
+
+async def build_search_keyword_async(instruction: str) -> str:
+    return _keyword_from_intent(await build_search_intent_async(instruction))
+
+
+def _keyword_from_intent(search_intent: SearchIntent) -> str:
     keyword_parts: list[str] = []
-    search_intent = build_search_intent(instruction)
 
     if search_intent.keyword and search_intent.keyword.lower() != "udgu":
         keyword_parts.append(search_intent.keyword.strip())
@@ -58,9 +206,7 @@ def build_search_keyword(instruction: str) -> str:
             keyword_parts.append(condition.strip())
             continue
         # if condition.apply_via == "keyword" and condition.value:
-        if condition.value:
+        if condition.value and condition.name not in FILTER_CONDITIONS:
             keyword_parts.append(condition.value.strip())
 
     return " ".join(part for part in keyword_parts if part)
-
-
@@ -0,0 +1,49 @@
+"""Learn how a site builds its search-result URLs and rebuild them per keyword."""
+
+from __future__ import annotations
+
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, quote, quote_plus, unquote, urlparse, urlunparse
+
+KEYWORD_PLACEHOLDER = "{keyword}"
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _norm(value: str) -> str:
+    return _WS_RE.sub(" ", value).strip().casefold()
+
+
+def learn_search_url_template(result_url: str, keyword: str) -> Optional[str]:
+    """
+    Turn a result URL such as `/s?k=iphone+16&ref=...` into `/s?k={keyword}`.
+
+    Only the parameter (or path segment) carrying the keyword is kept;
+    tracking parameters are dropped. Returns None when the keyword does not
+    appear in the URL (e.g. POST searches).
+    """
+    target = _norm(keyword)
+    if not target:
+        return None
+    parsed = urlparse(result_url)
+
+    for name, value in parse_qsl(parsed.query, keep_blank_values=True):
+        if _norm(value) == target:
+            query = f"{quote_plus(name)}={KEYWORD_PLACEHOLDER}"
+            return urlunparse(parsed._replace(query=query, fragment=""))
+
+    segments = parsed.path.split("/")
+    for index, segment in enumerate(segments):
+        if segment and _norm(unquote(segment)) == target:
+            segments[index] = KEYWORD_PLACEHOLDER
+            return urlunparse(parsed._replace(path="/".join(segments), query="", fragment=""))
+
+    return None
+
+
+def build_search_url(template: str, keyword: str) -> str:
+    base, _, query = template.partition("?")
+    if KEYWORD_PLACEHOLDER in query:
+        return f"{base}?{query.replace(KEYWORD_PLACEHOLDER, quote_plus(keyword.strip()))}"
+    return template.replace(KEYWORD_PLACEHOLDER, quote(keyword.strip(), safe=""))
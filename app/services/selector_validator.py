@@ -5,15 +5,81 @@ from __future__ import annotations
 import asyncio  # add at top
 
 from dataclasses import dataclass
-from typing import Iterable, Optional, Tuple
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
 
 from app.core.logger import get_logger
 logger = get_logger(__name__)
 
-from playwright.async_api import TimeoutError, Page, Locator
+from playwright.async_api import Error, TimeoutError, Page, Locator
 
 from app.services.session_store import SessionStore
 from app.services.fetcher import _create_stealth_context, _get_playwright
+from app.services.page_session import PageSession
+
+
+# Visibility/enabled report for every candidate in one round-trip. Invalid
+# selectors and missing nodes come back as unusable instead of throwing.
+_PROBE_JS = """
+(selectors) => selectors.map((selector, index) => {
+  let el = null;
+  try { el = document.querySelector(selector); } catch (e) { el = null; }
+  if (!el) return {selector, index, visible: false, enabled: false, score: 0};
+  const rect = el.getBoundingClientRect();
+  const style = window.getComputedStyle(el);
+  const visible = rect.width > 0 && rect.height > 0
+    && style.visibility !== "hidden" && style.display !== "none"
+    && parseFloat(style.opacity || "1") > 0;
+  const enabled = !el.disabled && !el.readOnly;
+  let score = 0;
+  if (el.closest("form")) score += 1;
+  if ((el.getAttribute("type") || "").toLowerCase() === "search" || el.closest("[role=search]")) score += 1;
+  if (rect.top >= 0 && rect.top < 400) score += 1;
+  return {selector, index, visible, enabled, score};
+})
+"""
+
+# True once the element count has stopped changing for `quietMs`. With a
+# `baseline` (the pre-submit count, same document) it must also have grown
+# past it, so a static page that simply hasn't been replaced yet doesn't count.
+_DOM_SETTLED_JS = """
+([quietMs, baseline]) => {
+  const n = document.getElementsByTagName("*").length;
+  const now = performance.now();
+  if (baseline !== null && n <= baseline) { window.__domSettle = null; return false; }
+  const s = window.__domSettle;
+  if (!s || s.n !== n) { window.__domSettle = {n, since: now}; return false; }
+  return document.readyState !== "loading" && now - s.since >= quietMs;
+}
+"""
+
+_ELEMENT_COUNT_JS = "() => document.getElementsByTagName('*').length"
+
+# Result cards are present: after a navigation any match counts; on the same
+# URL (SPA/XHR search) the count must differ from the pre-submit count, so
+# homepage tiles matching the selector aren't mistaken for results.
+_CARDS_READY_JS = """
+([selector, previousUrl, previousCount]) => {
+  let n = 0;
+  try { n = document.querySelectorAll(selector).length; } catch (e) { return false; }
+  if (n === 0) return false;
+  if (previousUrl === null || location.href !== previousUrl) return true;
+  return previousCount === null || n !== previousCount;
+}
+"""
+
+# how far the probe's DOM score (0-3) may move a candidate against the detector's order:
+# a gap of 2+ points lifts it past its neighbour, never further
+_DOM_SCORE_WEIGHT = 0.6
+
+_ANY_USABLE_JS = f"(selectors) => ({_PROBE_JS.strip()})(selectors).some(r => r.visible && r.enabled)"
+
+
+@dataclass
+class ScrollReport:
+    scrolls: int
+    elapsed_ms: int
+    card_count: Optional[int]
+    stop_reason: str
 
 
 @dataclass
@@ -21,23 +87,51 @@ class SelectorValidator:
     wait_for_selector: int = 10000
     navigation_timeout: int = 60000
     post_submit_wait: int = 5000
+    dom_quiet_ms: int = 500
+    # on the pre-submit document, DOM settling only counts after this long: a full-page
+    # search whose server is slow to answer must get the chance to change the URL first
+    submit_grace_ms: int = 1000
+    # probe all candidates at once instead of waiting on each in turn
+    parallel_probe: bool = True
+    # adaptive scroll controller (used when the domain's card selector is known)
+    scroll_max: int = 12
+    scroll_initial_pause_ms: int = 600
+    scroll_min_pause_ms: int = 150
+    scroll_max_pause_ms: int = 2500
+    scroll_stall_limit: int = 2
 
     def __post_init__(self) -> None:
         self._session_store = SessionStore()
 
-    async def validate_and_submit(self, url: str, selectors: Iterable[str], keyword: str, skip_validation: bool) -> Optional[Tuple[str, str]]:
+    async def validate_and_submit(
+        self,
+        url: str,
+        selectors: Iterable[str],
+        keyword: str,
+        skip_validation: bool,
+        card_selector: Optional[str] = None,
+        target_count: Optional[int] = None,
+        session: Optional[PageSession] = None,
+    ) -> Optional[Tuple[str, str, str]]:
+        """
+        Submit `keyword` with the first working selector; returns (selector, html, result_url).
+        `card_selector`/`target_count` let the results scroll stop as soon as enough cards render.
+        With a `session`, submit on the run's already-loaded homepage instead of navigating again.
+        """
 
         storage_state_path = self._session_store.storage_state_path(url)
-
-        p = await _get_playwright()
-        browser, context, page = await _create_stealth_context(
-            p, storage_state_path if self._session_store.has(url) else None
-        )
+        context, page, loaded = await self._homepage(url, storage_state_path, session)
 
         try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=self.navigation_timeout)
+            if not loaded:
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.navigation_timeout)
 
-            for selector in dict.fromkeys(selectors):
+            ordered = list(dict.fromkeys(selectors))
+            probed = not skip_validation and self.parallel_probe
+            if probed:
+                ordered = await self._rank_usable_selectors(page, ordered)
+
+            for selector in ordered:
                 logger.info("Validating selector '%s'", selector)
                 if skip_validation:
                     try:
@@ -45,18 +139,27 @@ class SelectorValidator:
                     except TimeoutError:
                         logger.warning("Selector '%s' not found during skip-validation path", selector)
                         continue
+                elif probed:
+                    handle = page.locator(selector).first
                 else:
                     handle = await self._get_valid_handle(page, selector)
                     if not handle:
                         logger.warning("Selector '%s' failed validation", selector)
                         continue
-                await self._fill_and_submit(handle, keyword)
-                await self._await_results(page)
-                await self._scroll_results(page)
-                html = await page.content()
-                await context.storage_state(path=storage_state_path)
-                logger.info("Selector '%s' validated and submitted successfully", selector)
-                return selector, html
+                previous_url = page.url
+                previous_count = await self._count_cards(page, card_selector) if card_selector else None
+                if probed:
+                    try:
+                        previous_elements = await self._fill_and_submit(page, handle, keyword)
+                    except Exception as exc:
+                        logger.warning("Selector '%s' passed the probe but could not be filled: %s", selector, exc)
+                        continue
+                else:
+                    previous_elements = await self._fill_and_submit(page, handle, keyword)
+                return await self._collect_results(
+                    page, context, storage_state_path, selector, card_selector, target_count,
+                    previous_url, previous_count, previous_elements,
+                )
             
         finally:
             try:
@@ -66,30 +169,398 @@ class SelectorValidator:
 
         return None
 
+    async def race_cached_and_detect(
+        self,
+        url: str,
+        cached_selector: str,
+        keyword: str,
+        detect: Callable[[str], Awaitable[List[str]]],
+        card_selector: Optional[str] = None,
+        target_count: Optional[int] = None,
+        session: Optional[PageSession] = None,
+    ) -> Optional[Tuple[str, str, str]]:
+        """
+        Speculative variant of `validate_and_submit` for domains with a cached
+        selector. On one loaded page, wait for the cached selector while
+        `detect(html)` produces fresh candidates; submit with whichever
+        becomes usable first. Detection keeps running behind a cached winner
+        and is only cancelled once a selector has been filled, so a cached
+        selector that appears but can't be filled falls back to it.
+        """
+        storage_state_path = self._session_store.storage_state_path(url)
+        context, page, loaded = await self._homepage(url, storage_state_path, session)
+        fresh_task: Optional[asyncio.Task] = None
 
-    async def _await_results(self, page: Page) -> None:
-        selectors = [
-            ".srp-results",
-            ".s-item",
-            "[data-testid='listing']",
-            "[data-component-type='s-search-result']",
-        ]
-        tasks = [asyncio.create_task(page.wait_for_selector(s, timeout=self.post_submit_wait)) for s in selectors]
-        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-        for t in pending:
-            t.cancel()
         try:
-            await page.wait_for_load_state("networkidle", timeout=self.post_submit_wait)
+            if not loaded:
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.navigation_timeout)
+
+            cached_task = asyncio.create_task(self._cached_usable(page, cached_selector))
+            fresh_task = asyncio.create_task(self._detect_usable(page, detect))
+            winners = await self._first_success([cached_task, fresh_task], keep=fresh_task)
+            tried = set()
+            while winners:
+                for selector in winners:
+                    if selector in tried:
+                        continue
+                    tried.add(selector)
+                    logger.info("Submitting with selector '%s'", selector)
+                    previous_url = page.url
+                    previous_count = await self._count_cards(page, card_selector) if card_selector else None
+                    try:
+                        previous_elements = await self._fill_and_submit(page, page.locator(selector).first, keyword)
+                    except Exception as exc:
+                        logger.warning("Selector '%s' could not be filled: %s", selector, exc)
+                        continue
+                    if fresh_task is not None:
+                        fresh_task.cancel()
+                    return await self._collect_results(
+                        page, context, storage_state_path, selector, card_selector, target_count,
+                        previous_url, previous_count, previous_elements,
+                    )
+                if fresh_task is None:
+                    break
+                # nothing in this batch could be filled: fall back to the detected candidates
+                winners = await self._settled(fresh_task)
+                fresh_task = None
+
+        finally:
+            if fresh_task is not None and not fresh_task.done():
+                fresh_task.cancel()
+                await asyncio.gather(fresh_task, return_exceptions=True)
+            try:
+                await context.close()
+            except Exception:
+                logger.warning("Playwright context failed to close cleanly")
+
+        return None
+
+    async def _homepage(self, url: str, storage_state_path: str, session: Optional[PageSession]):
+        """(context, page, loaded): the session's live page when it has one, else a fresh, unloaded page."""
+        handoff = await session.take_page() if session else None
+        if handoff:
+            context, page = handoff
+            return context, page, True
+        p = await _get_playwright()
+        _, context, page = await _create_stealth_context(
+            p, storage_state_path if self._session_store.has(url) else None
+        )
+        return context, page, False
+
+    async def _cached_usable(self, page: Page, selector: str) -> List[str]:
+        try:
+            await page.wait_for_selector(selector, timeout=self.wait_for_selector)
         except TimeoutError:
-            logger.warning("Timed out waiting for network idle; continuing with current HTML")
+            logger.warning("Cached selector '%s' did not appear", selector)
+            return []
+        return [selector]
+
+    async def _detect_usable(self, page: Page, detect: Callable[[str], Awaitable[List[str]]]) -> List[str]:
+        candidates = await detect(await page.content())
+        return await self._rank_usable_selectors(page, list(dict.fromkeys(candidates)))
+
+    @staticmethod
+    async def _settled(task: asyncio.Task) -> List[str]:
+        """The task's result once it finishes; [] if it failed or was cancelled."""
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            return []
+        except Exception as exc:
+            logger.warning("Selector race branch failed: %r", exc)
+            return []
+
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Task], keep: Optional[asyncio.Task] = None) -> List[str]:
+        """Return the first non-empty task result and cancel the rest, except `keep`."""
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is not None:
+                        logger.warning("Selector race branch failed: %r", task.exception())
+                        continue
+                    if task.result():
+                        return task.result()
+            return []
+        finally:
+            pending.discard(keep)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _collect_results(
+        self,
+        page: Page,
+        context,
+        storage_state_path: str,
+        selector: str,
+        card_selector: Optional[str] = None,
+        target_count: Optional[int] = None,
+        previous_url: Optional[str] = None,
+        previous_count: Optional[int] = None,
+        previous_elements: Optional[int] = None,
+    ) -> Tuple[str, str, str]:
+        await self._await_results(
+            page, card_selector=card_selector, previous_url=previous_url, previous_count=previous_count,
+            previous_elements=previous_elements,
+        )
+        await self._scroll_results(page, card_selector=card_selector, target_count=target_count)
+        html = await self._content(page)
+        await context.storage_state(path=storage_state_path)
+        logger.info("Selector '%s' validated and submitted successfully", selector)
+        return selector, html, page.url
+
+    async def open_results(
+        self,
+        result_url: str,
+        card_selector: Optional[str] = None,
+        target_count: Optional[int] = None,
+    ) -> Optional[str]:
+        """Load a search-result URL directly (no homepage, no typing) and return its HTML."""
+        storage_state_path = self._session_store.storage_state_path(result_url)
+
+        p = await _get_playwright()
+        browser, context, page = await _create_stealth_context(
+            p, storage_state_path if self._session_store.has(result_url) else None
+        )
+
+        try:
+            await page.goto(result_url, wait_until="domcontentloaded", timeout=self.navigation_timeout)
+            await self._await_results(page, card_selector=card_selector)
+            await self._scroll_results(page, card_selector=card_selector, target_count=target_count)
+            html = await self._content(page)
+            await context.storage_state(path=storage_state_path)
+            return html
+        except Exception as exc:
+            logger.warning("Direct result fetch failed for %s: %s", result_url, exc)
+            return None
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                logger.warning("Playwright context failed to close cleanly")
+
+
+    async def _await_results(
+        self,
+        page: Page,
+        card_selector: Optional[str] = None,
+        previous_url: Optional[str] = None,
+        previous_count: Optional[int] = None,
+        previous_elements: Optional[int] = None,
+    ) -> str:
+        """
+        Wait until the results page is usable and return the signal that fired.
+        The URL changing, the result cards appearing and the DOM settling are
+        raced within one `post_submit_wait`; a URL change only restarts the
+        other two on the new document. On the pre-submit document the DOM
+        must grow past `previous_elements` and settling is only armed after
+        `submit_grace_ms`. `networkidle` is the last resort.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.post_submit_wait / 1000
+
+        def remaining_ms() -> int:
+            return max(int((deadline - loop.time()) * 1000), 1)
+
+        def watch_document(same_document: bool) -> dict:
+            baseline = previous_elements if same_document else None
+
+            def settled() -> Awaitable:
+                return page.wait_for_function(
+                    _DOM_SETTLED_JS, arg=[self.dom_quiet_ms, baseline], polling=100, timeout=remaining_ms()
+                )
+
+            waiters = {
+                "dom_settled": self._after(self.submit_grace_ms, settled)
+                if same_document and previous_url else settled()
+            }
+            if card_selector:
+                waiters["cards"] = page.wait_for_function(
+                    _CARDS_READY_JS, arg=[card_selector, previous_url, previous_count],
+                    polling=100, timeout=remaining_ms(),
+                )
+            return waiters
+
+        waiters = watch_document(same_document=True)
+        if previous_url:
+            waiters["url_changed"] = page.wait_for_url(
+                lambda u: u != previous_url, wait_until="commit", timeout=remaining_ms()
+            )
+        tasks = {asyncio.ensure_future(self._signal(w)): name for name, w in waiters.items()}
+
+        signal = None
+        try:
+            while tasks and signal is None and loop.time() < deadline:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    name = tasks.pop(task)
+                    if not task.result():
+                        continue
+                    if name != "url_changed":
+                        signal = name
+                        break
+                    # the old document is gone: watch the new one for cards / settling
+                    for stale in [t for t, n in tasks.items() if n != "url_changed"]:
+                        stale.cancel()
+                        tasks.pop(stale)
+                    tasks.update(
+                        {asyncio.ensure_future(self._signal(w)): n for n, w in watch_document(same_document=False).items()}
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if signal is None:
+            if await self._signal(page.wait_for_load_state("networkidle", timeout=self.post_submit_wait)):
+                signal = "networkidle"
+            else:
+                signal = "timeout"
+                logger.warning("No readiness signal after submit; continuing with current HTML")
+
+        logger.info("Results ready after %d ms (%s)", int((loop.time() - started) * 1000), signal)
+        return signal
+
+    @staticmethod
+    async def _after(delay_ms: int, make: Callable[[], Awaitable]) -> Any:
+        await asyncio.sleep(delay_ms / 1000)
+        return await make()
+
+    async def _content(self, page: Page, attempts: int = 3) -> str:
+        """`page.content()`, waiting out a navigation that is still in progress."""
+        for attempt in range(attempts):
+            try:
+                return await page.content()
+            except Error as exc:
+                if attempt == attempts - 1 or "navigating" not in str(exc):
+                    raise
+                logger.info("Page still navigating; waiting before reading its HTML")
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=self.navigation_timeout)
+                except TimeoutError:
+                    pass
+
+    @staticmethod
+    async def _signal(waiter: Awaitable) -> bool:
+        try:
+            await waiter
+        except Exception:
+            return False
+        return True
 
     
-    async def _scroll_results(self, page: Page, step_px: int = 1200, repeats: int = 4, pause_ms: int = 800) -> None:
-        for _ in range(repeats):
-            await page.mouse.wheel(0, step_px)          # scroll down
-            await page.wait_for_timeout(pause_ms)       # give content time to render
-        await page.wait_for_timeout(pause_ms)           # final settle
+    async def _scroll_results(
+        self,
+        page: Page,
+        card_selector: Optional[str] = None,
+        target_count: Optional[int] = None,
+        step_px: int = 1200,
+        repeats: int = 4,
+        pause_ms: int = 800,
+    ) -> ScrollReport:
+        """
+        Scroll to trigger lazy loading. With a known card selector, stop as soon
+        as `target_count` cards are rendered or the count stops growing, and
+        size each pause from how long the last batch took to appear. Without
+        one, fall back to a fixed number of wheel scrolls.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
 
+        count = await self._count_cards(page, card_selector) if card_selector else None
+        if count is None:
+            for _ in range(repeats):
+                await page.mouse.wheel(0, step_px)          # scroll down
+                await page.wait_for_timeout(pause_ms)       # give content time to render
+            await page.wait_for_timeout(pause_ms)           # final settle
+            report = ScrollReport(repeats, int((loop.time() - started) * 1000), None, "fixed")
+            logger.info("Scrolled %d times in %d ms (fixed)", report.scrolls, report.elapsed_ms)
+            return report
+
+        pause = self.scroll_initial_pause_ms
+        scrolls = stalls = 0
+        reason = "max_scrolls"
+        while scrolls < self.scroll_max:
+            if target_count and count >= target_count:
+                reason = "limit"
+                break
+            await page.mouse.wheel(0, step_px)
+            scrolls += 1
+            waited_from = loop.time()
+            try:
+                await page.wait_for_function(
+                    "([sel, n]) => document.querySelectorAll(sel).length > n",
+                    arg=[card_selector, count],
+                    timeout=pause,
+                )
+            except TimeoutError:
+                pass
+            latency_ms = int((loop.time() - waited_from) * 1000)
+            new_count = await self._count_cards(page, card_selector) or 0
+            if new_count > count:
+                stalls = 0
+                # next batch probably loads about as fast as this one did
+                pause = min(max(latency_ms * 2, self.scroll_min_pause_ms), self.scroll_max_pause_ms)
+            else:
+                stalls += 1
+                if stalls >= self.scroll_stall_limit:
+                    reason = "stalled"
+                    break
+                pause = min(int(pause * 1.5), self.scroll_max_pause_ms)
+            count = new_count
+
+        report = ScrollReport(scrolls, int((loop.time() - started) * 1000), count, reason)
+        logger.info(
+            "Scrolled %d times in %d ms; %d cards match '%s' (%s)",
+            report.scrolls, report.elapsed_ms, count, card_selector, reason,
+        )
+        return report
+
+    async def _count_cards(self, page: Page, card_selector: str) -> Optional[int]:
+        try:
+            return await page.locator(card_selector).count()
+        except Exception as exc:
+            logger.warning("Card selector '%s' unusable for scroll tracking: %s", card_selector, exc)
+            return None
+
+
+    async def _rank_usable_selectors(self, page: Page, selectors: list[str]) -> list[str]:
+        """
+        Wait (at most one `wait_for_selector` timeout) until any candidate is
+        visible and enabled, then return the usable ones, best first. The
+        detector's order (its confidence) decides; the DOM score only breaks
+        near-ties between neighbours.
+        """
+        if not selectors:
+            return []
+        try:
+            await page.wait_for_function(_ANY_USABLE_JS, arg=selectors, timeout=self.wait_for_selector)
+        except TimeoutError:
+            logger.warning("None of %d selector candidates became visible and enabled", len(selectors))
+            return []
+
+        report = await page.evaluate(_PROBE_JS, selectors)
+        usable = [r for r in report if r["visible"] and r["enabled"]]
+        usable = [
+            r for _, r in sorted(
+                enumerate(usable), key=lambda pr: (pr[0] - _DOM_SCORE_WEIGHT * pr[1]["score"], pr[0])
+            )
+        ]
+        ranked = [r["selector"] for r in usable]
+        logger.info("Usable selectors after probe: %s", ranked)
+        return ranked
 
     async def _get_valid_handle(self, page: Page, selector: str) -> Optional[Locator]:
 
@@ -122,7 +593,14 @@ class SelectorValidator:
 
         # return handle
 
-    async def _fill_and_submit(self, handle, keyword: str) -> None:
-        await handle.click()
-        await handle.fill(keyword)  # instant value set triggers input events
+    async def _fill_and_submit(self, page: Page, handle, keyword: str) -> Optional[int]:
+        """Type and submit; returns the page's element count just before Enter (None if unreadable)."""
+        await handle.click(timeout=self.wait_for_selector)
+        await handle.fill(keyword, timeout=self.wait_for_selector)  # instant value set triggers input events
+        try:
+            # after typing, so an autocomplete dropdown isn't taken for results
+            elements = await page.evaluate(_ELEMENT_COUNT_JS)
+        except Error:
+            elements = None
         await handle.press("Enter")
+        return elements
@@ -0,0 +1,126 @@
+"""Cheap structural signals that identify an ecommerce page without the LLM.
+
+`preclassify(html)` looks for schema.org Product/Offer JSON-LD, an
+`og:type` of product, cart/checkout links, add-to-cart buttons and the
+density of price-looking strings, and turns them into a label plus a
+confidence. It only ever answers "ecommerce"; everything else is left to
+the classifier chain.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from lxml import etree, html as lxml_html
+
+PRODUCT_TYPES = {"product", "offer", "aggregateoffer", "productgroup", "onlinestore", "store"}
+OG_PRODUCT_TYPES = ("product", "og:product", "product.item", "product.group")
+CART_HREF_RE = re.compile(r"/(cart|basket|bag|checkout|panier|warenkorb|carrito)\b", re.I)
+ADD_TO_CART_RE = re.compile(
+    r"add to (cart|basket|bag)|buy now|ajouter au panier|in den warenkorb|añadir al carrito", re.I
+)
+PRICE_RE = re.compile(
+    r"(?:[$€£¥]\s?\d[\d,.]*|\d[\d,.]*\s?(?:[$€£¥]|usd|eur|gbp|mad|dhs?)\b)", re.I
+)
+
+# weights add up to the score; confidence = score / FULL_SCORE
+WEIGHTS = {
+    "jsonld_product": 3,
+    "og_product": 2,
+    "cart_link": 2,
+    "add_to_cart": 2,
+    "many_prices": 2,
+    "some_prices": 1,
+}
+FULL_SCORE = 6
+MANY_PRICES = 10
+SOME_PRICES = 3
+
+
+@dataclass
+class SiteSignals:
+    jsonld_types: List[str] = field(default_factory=list)
+    og_type: Optional[str] = None
+    cart_links: int = 0
+    add_to_cart: int = 0
+    prices: int = 0
+
+    def score(self) -> Tuple[int, List[str]]:
+        hits = []
+        if any(t in PRODUCT_TYPES for t in self.jsonld_types):
+            hits.append("jsonld_product")
+        if self.og_type and self.og_type.lower() in OG_PRODUCT_TYPES:
+            hits.append("og_product")
+        if self.cart_links:
+            hits.append("cart_link")
+        if self.add_to_cart:
+            hits.append("add_to_cart")
+        if self.prices >= MANY_PRICES:
+            hits.append("many_prices")
+        elif self.prices >= SOME_PRICES:
+            hits.append("some_prices")
+        return sum(WEIGHTS[h] for h in hits), hits
+
+
+def extract_signals(html: str) -> SiteSignals:
+    signals = SiteSignals()
+    if not html:
+        return signals
+    try:
+        doc = lxml_html.fromstring(html)
+    except (ValueError, etree.ParserError):
+        return signals
+
+    for script in doc.xpath('//script[@type="application/ld+json"]'):
+        try:
+            payload = json.loads(script.text_content() or "")
+        except ValueError:
+            continue
+        signals.jsonld_types.extend(_jsonld_types(payload))
+
+    og = doc.xpath('//meta[@property="og:type"]/@content')
+    signals.og_type = og[0].strip() if og else None
+
+    signals.cart_links = sum(1 for href in doc.xpath("//a/@href") if CART_HREF_RE.search(href))
+
+    for bad in doc.xpath("//script | //style | //noscript"):
+        bad.drop_tree()
+    buttons = " ".join(
+        (el.text_content() or "") + " " + (el.get("value") or "") + " " + (el.get("aria-label") or "")
+        for el in doc.xpath("//button | //input[@type='submit'] | //a[@role='button']")
+    )
+    signals.add_to_cart = len(ADD_TO_CART_RE.findall(buttons))
+    signals.prices = len(PRICE_RE.findall(doc.text_content() or ""))
+    return signals
+
+
+def preclassify(html: str, min_confidence: float) -> Tuple[Optional[str], float, List[str]]:
+    """
+    Return ("ecommerce", confidence, hits) when the signals are strong
+    enough, else (None, confidence, hits). Runs in the CPU pool, so it
+    doesn't log; callers do.
+    """
+    score, hits = extract_signals(html).score()
+    confidence = round(min(1.0, score / FULL_SCORE), 2)
+    label = "ecommerce" if confidence >= min_confidence else None
+    return label, confidence, hits
+
+
+def _jsonld_types(payload) -> List[str]:
+    """Collect every @type in a JSON-LD payload, including @graph and nested offers."""
+    found: List[str] = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            types = node.get("@type")
+            for t in types if isinstance(types, list) else [types]:
+                if isinstance(t, str):
+                    found.append(t.rsplit("/", 1)[-1].lower())
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+    return found
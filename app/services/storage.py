@@ -12,4 +12,39 @@ def save_cards(domain: str, cards: list[Cards]) -> str:
     payload = [card.model_dump() for card in cards]
     file_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
     logger.info("Persisted %d cards to %s", len(cards), file_path)
-    return str(file_path)
\ No newline at end of file
+    return str(file_path)
+
+class CardSink:
+    """
+    Append-only JSONL file of cards, one line per card, flushed as each is
+    written so a crash keeps everything already done and readers can tail it.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+        self.count = 0
+
+    def write(self, card: Cards) -> None:
+        self._fh.write(json.dumps(card.model_dump(), ensure_ascii=False) + "\n")
+        self._fh.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+    def __enter__(self) -> "CardSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_card_sink(domain: str, suffix: str = "enriched", fresh: bool = True) -> CardSink:
+    """Sink at app/data/products/{domain}_{suffix}.jsonl; `fresh` drops the previous pass's lines."""
+    path = Path("app/data/products") / f"{domain}_{suffix}.jsonl"
+    if fresh:
+        path.unlink(missing_ok=True)
+    return CardSink(path)
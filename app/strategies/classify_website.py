@@ -1,47 +1,35 @@
-import json
-import os
 import asyncio
-from bs4 import BeautifulSoup
 from collections import defaultdict
+from app.core.logger import get_logger
 from app.services.fetcher import fetch_html
-from app.core.config import DATA_FILE
-from app.services.chains.builders import build_site_classifier_chain
-from app.prompts.prompts import EXPANDED_CLASSIFIER_PROMPT
+from app.core.config import (
+    CLASSIFIER_EXAMPLE_MIN_CONFIDENCE,
+    CLASSIFIER_RULE_MIN_CONFIDENCE,
+    CLASSIFIER_SNIPPET_TOKENS,
+)
+from app.services.chains.builders import site_classifier_inputs
+from app.services.chains.registry import get_chain
+from app.services.cpu_pool import run_html_task
+from app.services.domain_labels import get_domain_label_store
+from app.services.example_index import format_examples, get_example_index, vote
+from app.services.example_store import get_example_store
+from app.services.html_compactor import compact_text
+from app.services.page_session import PageSession
+from app.services.site_signals import preclassify
+
+logger = get_logger(__name__)
+
+# returned, never cached, when the page could not be read
+UNKNOWN_LABEL = "unknown"
 
 
-_examples_cache = None
-_label_cache = None  # url -> label
-
 def load_examples():
-    global _examples_cache, _label_cache
-    if _examples_cache is not None:
-        return _examples_cache
-
-    if not os.path.exists(DATA_FILE):
-        _examples_cache, _label_cache = [], {}
-        return _examples_cache
-
-    with open(DATA_FILE, "r") as f:
-        _examples_cache = json.load(f)
-    _label_cache = {e["url"]: e["label"] for e in _examples_cache}
-    return _examples_cache
+    """All stored examples, including ones other workers appended since the last call."""
+    return get_example_store().examples()
 
 
 def save_example(url: str, label: str, snippet: str):
-    global _label_cache
-    data = load_examples()
-
-    if _label_cache and url in _label_cache:
-        return
-
-    entry = {"url": url, "label": label, "snippet": snippet}
-    data.append(entry)
-
-    if _label_cache is not None:
-        _label_cache[url] = label
-
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    get_example_store().add(url, label, snippet)
 
 
 def select_examples(data, max_per_label=2, max_total=30):
@@ -64,30 +52,62 @@ def select_examples(data, max_per_label=2, max_total=30):
     return "\n".join(lines)
 
 
-def build_hybrid_classifier(url: str) -> str:
+async def build_hybrid_classifier_async(url: str, session: PageSession | None = None) -> str:
     """
-    Classify a website type using memory few-shot + LLM.
+    Classify a website type using memory few-shot + LLM, on the caller's
+    event loop so the fetch reuses the shared Playwright browser. With a
+    `session`, read the run's shared homepage load instead of fetching.
     """
-    data = load_examples()
+    domain_labels = get_domain_label_store()
 
-    label = _label_cache.get(url) if _label_cache else None
+    # 1. Domain cache (known ecommerce domains + TTL'd labels), then exact URL
+    label = domain_labels.get(url)
     if label is not None:
+        logger.info("Domain label cache hit for %s: %s", url, label)
+        return label
+    label = get_example_store().label(url)
+    if label is not None:
+        domain_labels.set(url, label, "example")
         return label
 
-    # 2. Fetch HTML
-    html = asyncio.run(fetch_html(url))
-    snippet = BeautifulSoup(html, "html.parser").get_text(" ", strip=True)[:1000]
-
-    # 3. Select balanced examples
-    examples_str = select_examples(data)
+    # 2. Fetch HTML and compact it off the event loop
+    html = await session.html() if session else await fetch_html(url)
+    snippet = await run_html_task(compact_text, html, max_tokens=CLASSIFIER_SNIPPET_TOKENS) if html else ""
+    if not snippet.strip():
+        # an LLM guess from the URL alone would sit in the domain cache for its whole TTL
+        logger.warning("No page content for %s; leaving it unclassified", url)
+        return UNKNOWN_LABEL
+
+    # 2b. Structural signals (JSON-LD Product/Offer, og:type, cart links, prices) settle obvious shops
+    label, confidence, hits = await run_html_task(preclassify, html, CLASSIFIER_RULE_MIN_CONFIDENCE)
+    logger.info("Pre-classifier signals %s (confidence %.2f)", hits, confidence)
+    if label is not None:
+        domain_labels.set(url, label, "rules")
+        if confidence >= CLASSIFIER_EXAMPLE_MIN_CONFIDENCE:
+            save_example(url, label, snippet[:500])
+        return label
 
-    # 4. Prepare classifier chain
-    classifier_chain = build_site_classifier_chain(url, snippet, examples_str)
-    
-    # # 6. Run classification
-    result = classifier_chain.invoke()
+    # 3. Nearest stored examples: answer directly on strong agreement, else use them as few-shot context
+    data = load_examples()
+    neighbors = await asyncio.to_thread(get_example_index().nearest, f"{url}\n{snippet[:500]}", data)
+    if neighbors:
+        label, agreement = vote(neighbors)
+        if label is not None:
+            logger.info("Nearest-neighbour label %s for %s (agreement %.2f)", label, url, agreement)
+            # not saved as an example: the neighbours would end up voting for their own echo
+            domain_labels.set(url, label, "knn")
+            return label
+        examples_str = format_examples(neighbors)
+    else:
+        # no embedding model (or no examples yet): balanced examples
+        examples_str = select_examples(data)
+
+    # 4. Run the prebuilt classifier chain; only the inputs change per URL
+    classifier_chain = get_chain("site_classifier")
+    result = await classifier_chain.ainvoke(site_classifier_inputs(url, snippet, examples_str))
 
     # 7. Save for future
+    domain_labels.set(url, result, "llm")
     save_example(url, result, snippet[:500])
 
     return result
@@ -11,20 +11,25 @@ from urllib.parse import urlparse
 from app.core.logger import get_logger
 
 from app.models.cards import Cards
-from app.services.fetcher import fetch_html
-from app.services.parser import detect_search_selectors
-from app.services.search_intent import build_search_keyword
+from app.pipeline.dag import TaskDAG
+from app.services.cpu_pool import warm_up as warm_up_cpu_pool
+from app.services.fetcher import warm_up_browser
+from app.services.page_session import PageSession
+from app.services.parser import detect_search_candidates_async
+from app.services.search_intent import build_search_keyword_async
+from app.services.search_url import build_search_url, learn_search_url_template
 from app.services.selector_store import SelectorStore
 from app.services.selector_validator import SelectorValidator
 from app.services.session_store import SessionStore
 # from app.services.html_filtering import extract_cards  # <- heuristic extractor
 # from app.services.card_enricher import card_enricher
-from app.services.card_selector import extract_cards_from_html
+from app.services.card_selector import extract_cards_from_html_async
 from app.services.storage import save_cards
 
 logger = get_logger(__name__)
 
 DEFAULT_TEST_KEYWORD = "test"
+RESULT_CARD_LIMIT = 10
 
 
 @dataclass
@@ -33,11 +38,14 @@ class EcommerceContext:
     instruction: str
     html: Optional[str] = None
     selector_candidates: Optional[list[str]] = None
+    selector_sources: Optional[dict[str, str]] = None
     validated_selector: Optional[str] = None
     result_html: Optional[str] = None
+    search_url: Optional[str] = None
     search_keyword: Optional[str] = None
     products: Optional[list[Cards]] = None
     output_path: Optional[str] = None
+    page_session: Optional[PageSession] = None
 
 
 class EcommerceStrategy:
@@ -47,18 +55,87 @@ class EcommerceStrategy:
         self,
         validator: SelectorValidator | None = None,
         selector_store: SelectorStore | None = None,
+        speculative: bool = True,
     ) -> None:
         self.validator = validator or SelectorValidator()
         self.selector_store = selector_store or SelectorStore()
+        # race the cached search selector against fresh detection on the same page
+        self.speculative = speculative
 
-    async def run(self, url: str, instruction: str) -> EcommerceContext:
-        ctx = EcommerceContext(url=url, instruction=instruction)
+    def prepare(
+        self,
+        url: str,
+        instruction: str,
+        dag: TaskDAG | None = None,
+        session: PageSession | None = None,
+    ) -> TaskDAG:
+        """
+        Start the steps that depend on neither the page nor each other: the
+        intent LLM call, browser and HTML process pool warm-up and (when no
+        cached search path exists) the homepage load. `run` picks their results up from the DAG.
+        """
+        dag = dag or TaskDAG()
+        dag.add("intent", lambda: build_search_keyword_async(instruction))
+        dag.add("browser", warm_up_browser)
+        dag.add("cpu_pool", warm_up_cpu_pool)
+
+        cache = self.selector_store.get(self._domain(url)) or {}
+        if session and not cache.get("search_url") and not cache.get("search"):
+            dag.add("homepage", lambda _: session.html(), deps=("browser",))
+        return dag
+
+    async def run(
+        self,
+        url: str,
+        instruction: str,
+        dag: TaskDAG | None = None,
+        after: tuple[str, ...] = (),
+        session: PageSession | None = None,
+    ) -> EcommerceContext:
+        """
+        `after` names DAG steps that gated this run (e.g. classification) for
+        the critical path. `session` is the run's shared homepage load; the
+        caller that passes one also closes it.
+        """
+        owns_session = session is None
+        owns_dag = dag is None
+        session = session or PageSession(url)
+        dag = self.prepare(url, instruction, dag, session)
+        ctx = EcommerceContext(url=url, instruction=instruction, page_session=session)
+        try:
+            ctx.search_keyword = await dag.result("intent")
+            return await dag.run(
+                "search",
+                lambda *_: self._search(ctx, dag),
+                deps=("intent", *after),
+            )
+        finally:
+            if owns_dag:
+                # standalone run: nobody else will stop the warm-up and homepage steps
+                await dag.aclose()
+            if owns_session:
+                await session.close()
 
-        ctx.search_keyword = build_search_keyword(instruction)
+    async def _search(self, ctx: EcommerceContext, dag: TaskDAG) -> EcommerceContext:
+        url = ctx.url
         domain = self._domain(url)
 
         cache = self.selector_store.get(domain) or {}
+        search_template = cache.get("search_url")
+        if search_template:
+            if await self._search_via_template(ctx, domain, search_template):
+                return ctx
+            logger.warning(
+                "Search URL template '%s' stopped working; falling back to form submission",
+                search_template,
+            )
+            self.selector_store.set(domain, {"search_url": None})
+            ctx.search_url = ctx.result_html = ctx.products = ctx.output_path = None
+
         search_selector = cache.get("search")
+        if search_selector and self.speculative:
+            return await self._race_cached_selector(ctx, domain, search_selector)
+
         if search_selector:
             logger.info("Using cached selector '%s' for %s", search_selector, domain)
             result = await self.validator.validate_and_submit(
@@ -66,11 +143,14 @@ class EcommerceStrategy:
                 selectors=[search_selector],
                 keyword=ctx.search_keyword,
                 skip_validation=True,
+                session=ctx.page_session,
+                **self._scroll_hints(cache),
             )
             if result:
-                ctx.validated_selector, ctx.result_html = result
+                ctx.validated_selector, ctx.result_html, result_url = result
 
                 await self._populate_cards(ctx, domain)
+                self._learn_search_url(ctx, domain, result_url)
                 ctx.selector_candidates = [search_selector]
                 return ctx
             logger.warning(
@@ -78,12 +158,14 @@ class EcommerceStrategy:
                 search_selector,
             )
 
-        ctx.html = await fetch_html(url, wait=5000, timeout=60000)
+        ctx.html = await dag.run("homepage", ctx.page_session.html)
         if not ctx.html:
             logger.error("Failed to fetch HTML for %s", url)
             return ctx
 
-        ctx.selector_candidates = detect_search_selectors(ctx.html, limit=10)
+        candidates = await detect_search_candidates_async(ctx.html, limit=10)
+        ctx.selector_candidates = [cand.css for cand in candidates]
+        ctx.selector_sources = {cand.css: cand.source for cand in candidates}
         if not ctx.selector_candidates:
             logger.error("No selector candidates produced for %s", url)
             return ctx
@@ -93,22 +175,98 @@ class EcommerceStrategy:
             selectors=ctx.selector_candidates,
             keyword=ctx.search_keyword,
             skip_validation=False,
+            session=ctx.page_session,
+            **self._scroll_hints(cache),
         )
         if result:
-            ctx.validated_selector, ctx.result_html = result
+            ctx.validated_selector, ctx.result_html, result_url = result
             await self._populate_cards(ctx, domain)
-            if ctx.validated_selector:
-                self.selector_store.set(domain, {"search": ctx.validated_selector})
+            self._learn_search_url(ctx, domain, result_url)
+            self._record_search_selector(ctx, domain)
         else:
             logger.error("No valid search input selector found for %s", url)
 
         return ctx
 
+    async def _race_cached_selector(self, ctx: EcommerceContext, domain: str, search_selector: str) -> EcommerceContext:
+        """Validate the cached selector and detect fresh candidates concurrently; keep the first to succeed."""
+        logger.info("Racing cached selector '%s' against fresh detection for %s", search_selector, domain)
+
+        async def detect(html: str) -> list[str]:
+            ctx.html = html
+            candidates = await detect_search_candidates_async(html, limit=10)
+            ctx.selector_candidates = [cand.css for cand in candidates]
+            ctx.selector_sources = {cand.css: cand.source for cand in candidates}
+            return ctx.selector_candidates
+
+        result = await self.validator.race_cached_and_detect(
+            url=ctx.url,
+            cached_selector=search_selector,
+            keyword=ctx.search_keyword,
+            detect=detect,
+            session=ctx.page_session,
+            **self._scroll_hints(self.selector_store.get(domain) or {}),
+        )
+        if not result:
+            logger.error("Neither the cached selector nor fresh detection worked for %s", ctx.url)
+            return ctx
+
+        ctx.validated_selector, ctx.result_html, result_url = result
+        ctx.selector_sources = {**(ctx.selector_sources or {}), search_selector: "cached"}
+        if not ctx.selector_candidates:
+            ctx.selector_candidates = [search_selector]
+        await self._populate_cards(ctx, domain)
+        self._learn_search_url(ctx, domain, result_url)
+        self._record_search_selector(ctx, domain)
+        return ctx
+
+    def _record_search_selector(self, ctx: EcommerceContext, domain: str) -> None:
+        if not ctx.validated_selector:
+            return
+        source = (ctx.selector_sources or {}).get(ctx.validated_selector, "unknown")
+        logger.info("Validated search selector '%s' came from %s", ctx.validated_selector, source)
+        payload = {"search": ctx.validated_selector}
+        if source != "cached":
+            payload["search_source"] = source
+        self.selector_store.set(domain, payload)
+
     def _domain(self, url: str) -> str:
         return urlparse(url).netloc.lower()
 
+    def _scroll_hints(self, cache: dict) -> dict:
+        """Let the validator stop scrolling once the cached card selector matches enough cards."""
+        card_selector = (cache.get("card") or {}).get("selector")
+        return {"card_selector": card_selector, "target_count": RESULT_CARD_LIMIT}
+
+    async def _search_via_template(self, ctx: EcommerceContext, domain: str, template: str) -> bool:
+        """Skip the homepage and search box: build the result URL and fetch it directly."""
+        ctx.search_url = build_search_url(template, ctx.search_keyword)
+        logger.info("Fetching results directly from learned URL %s", ctx.search_url)
+        ctx.result_html = await self.validator.open_results(
+            ctx.search_url,
+            **self._scroll_hints(self.selector_store.get(domain) or {}),
+        )
+        if not ctx.result_html:
+            return False
+        await self._populate_cards(ctx, domain)
+        if not ctx.products and (self.selector_store.get(domain) or {}).get("card"):
+            # the page may be fine and only the card layout changed: rediscover before blaming the URL
+            logger.info("Cached card selector found nothing on %s; rediscovering cards", ctx.search_url)
+            await self._populate_cards(ctx, domain, reuse_cached=False)
+        return bool(ctx.products)
+
+    def _learn_search_url(self, ctx: EcommerceContext, domain: str, result_url: str) -> None:
+        # only trust URLs that actually produced cards
+        if not ctx.products or not ctx.search_keyword:
+            return
+        template = learn_search_url_template(result_url, ctx.search_keyword)
+        if template:
+            logger.info("Learned search URL template '%s' for %s", template, domain)
+            ctx.search_url = result_url
+            self.selector_store.set(domain, {"search_url": template})
 
-    async def _populate_cards(self, ctx: EcommerceContext, domain: str) -> None:
+
+    async def _populate_cards(self, ctx: EcommerceContext, domain: str, reuse_cached: bool = True) -> None:
         if not ctx.result_html:
             logger.warning("No result HTML available to process for %s", ctx.url)
             return
@@ -118,17 +276,18 @@ class EcommerceStrategy:
         cached_selector = cached_card.get("selector")
         cached_mapping = cached_card.get("mapping")
 
-        extraction = extract_cards_from_html(
+        extraction = await extract_cards_from_html_async(
             ctx.result_html,
             base_url=ctx.url,
-            limit=10,
+            limit=RESULT_CARD_LIMIT,
             cached_selector=cached_selector,
             cached_mapping=cached_mapping,
-            reuse_cached=True,
+            reuse_cached=reuse_cached,
         )
         ctx.products = extraction.cards or []
 
-        if extraction.selector and extraction.mapping:
+        # a forced rediscovery only replaces the cached layout when it actually found cards
+        if extraction.selector and extraction.mapping and (reuse_cached or ctx.products):
             self.selector_store.set(
                 domain,
                 {
@@ -147,8 +306,18 @@ class EcommerceStrategy:
 
 _strategy: EcommerceStrategy | None = None
 
-async def run_ecommerce_flow(url: str, instruction: str) -> EcommerceContext:
+def get_ecommerce_strategy() -> EcommerceStrategy:
     global _strategy
     if _strategy is None:
         _strategy = EcommerceStrategy()
-    return await _strategy.run(url, instruction)
\ No newline at end of file
+    return _strategy
+
+
+async def run_ecommerce_flow(
+    url: str,
+    instruction: str,
+    dag: TaskDAG | None = None,
+    after: tuple[str, ...] = (),
+    session: PageSession | None = None,
+) -> EcommerceContext:
+    return await get_ecommerce_strategy().run(url, instruction, dag=dag, after=after, session=session)
\ No newline at end of file
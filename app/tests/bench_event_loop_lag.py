@@ -0,0 +1,67 @@
+"""
+Event-loop lag while several card extractions run concurrently.
+
+Compares parsing on the loop (the old path) with the process-pool wrappers.
+Run with:  python -m app.tests.bench_event_loop_lag [concurrency] [cards]
+"""
+
+import asyncio
+import sys
+import time
+
+from app.services.card_selector import discover_card_selectors, discover_card_selectors_async
+from app.services.cpu_pool import shutdown_pool
+
+
+def _synthetic_listing(cards: int) -> str:
+    items = "".join(
+        f'<li class="s-item card"><img src="/img/{i}.jpg">'
+        f'<h3 class="s-item__title">Product {i}</h3>'
+        f'<span class="s-item__price">${i}.99</span>'
+        f'<a class="s-item__link" href="/itm/{i}">view</a></li>'
+        for i in range(cards)
+    )
+    return f"<html><head><script>{'x' * 200_000}</script></head><body><ul>{items}</ul></body></html>"
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float = 0.01) -> list[float]:
+    lags: list[float] = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+
+async def _measure(label: str, job, concurrency: int) -> None:
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(job() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = sorted(await beat) or [0.0]
+    p95 = lags[int(len(lags) * 0.95) - 1] if len(lags) > 1 else lags[0]
+    print(f"{label:<12} wall={elapsed:6.2f}s  lag max={lags[-1] * 1000:7.1f}ms  p95={p95 * 1000:7.1f}ms")
+
+
+async def main(concurrency: int, cards: int) -> None:
+    html = _synthetic_listing(cards)
+    print(f"{concurrency} concurrent runs over {len(html) / 1e6:.1f} MB of HTML")
+
+    async def on_loop():
+        discover_card_selectors(html)
+
+    async def pooled():
+        await discover_card_selectors_async(html)
+
+    await pooled()  # warm the pool so worker start-up is not measured
+    await _measure("on-loop", on_loop, concurrency)
+    await _measure("process-pool", pooled, concurrency)
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    cards = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    asyncio.run(main(concurrency, cards))
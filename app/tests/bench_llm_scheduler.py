@@ -0,0 +1,57 @@
+"""
+Drive the LLM scheduler against the local fake server.
+
+Fires a burst of mixed-priority chain calls through the shared Groq client
+and reports server-side 429s, scheduler metrics and per-priority latency.
+Run with:  python -m app.tests.bench_llm_scheduler [calls] [server_rpm]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+
+from app.tests.fake_llm_server import FakeLLMServer
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+SERVER_RPM = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+server = FakeLLMServer(port=0, rpm=SERVER_RPM, latency=0.1)
+server.start()
+
+# configure before the app modules read their settings
+os.environ["GROQ_BASE_URL"] = server.base_url
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["LLM_RPM"] = str(SERVER_RPM * 2)  # deliberately optimistic: exercises Retry-After handling
+
+from langchain_core.output_parsers import StrOutputParser  # noqa: E402
+from langchain_core.prompts import PromptTemplate  # noqa: E402
+
+from app.services.llm_engine import get_llm  # noqa: E402
+from app.services.llm_scheduler import PrioritizedRunnable, get_scheduler  # noqa: E402
+
+
+async def main() -> None:
+    chain = PromptTemplate.from_template("{text}") | get_llm() | StrOutputParser()
+    latencies: dict[int, list[float]] = defaultdict(list)
+
+    async def call(i: int) -> None:
+        priority = i % 3
+        started = time.perf_counter()
+        await PrioritizedRunnable(chain, priority).ainvoke({"text": f"request {i} " + "x" * 400})
+        latencies[priority].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(CALLS)))
+    print(f"{CALLS} calls in {time.perf_counter() - started:.1f}s; server served={server.served} 429s={server.rejected}")
+    print("scheduler:", get_scheduler().stats())
+    for priority in sorted(latencies):
+        values = latencies[priority]
+        print(f"priority {priority}: avg {sum(values) / len(values):.2f}s  max {max(values):.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Minimal local stand-in for Groq's OpenAI-compatible chat endpoint.
+
+It enforces its own requests-per-minute limit and answers with 429 plus
+Retry-After when exceeded, so the LLM scheduler can be exercised offline.
+Run with:  python -m app.tests.fake_llm_server [port] [rpm]
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 8765, rpm: int = 30, latency: float = 0.2, reply: str = "ok"):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.rpm = rpm
+        self.latency = latency
+        self.reply = reply
+        self.served = 0
+        self.rejected = 0
+        self._window: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def admit(self) -> float:
+        """Return 0 when the request is allowed, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            if len(self._window) >= self.rpm:
+                self.rejected += 1
+                return 60 - (now - self._window[0])
+            self._window.append(now)
+            self.served += 1
+            return 0.0
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeLLMServer
+
+    def log_message(self, *args) -> None:  # keep benchmark output readable
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length") or 0)) or b"{}")
+        wait = self.server.admit()
+        if wait:
+            self._send(429, {"error": {"message": "rate limit", "type": "rate_limit"}}, {"retry-after": f"{wait:.2f}"})
+            return
+
+        time.sleep(self.server.latency)
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+        self._send(200, {
+            "id": "fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.server.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 1, "total_tokens": prompt_chars // 4 + 1},
+        })
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    rpm = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    server = FakeLLMServer(port=port, rpm=rpm)
+    print(f"Fake LLM server on {server.base_url} ({rpm} rpm)")
+    server.serve_forever()
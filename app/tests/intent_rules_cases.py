@@ -0,0 +1,44 @@
+"""
+Rule-based search intent on a fixed set of instructions.
+
+Prints what `parse_search_intent` extracts for each case and flags the ones
+that differ from the expected conditions or land on the wrong side of
+SEARCH_INTENT_RULE_MIN_CONFIDENCE. No LLM call is made.
+Run with:  python -m app.tests.intent_rules_cases
+"""
+
+import sys
+
+from app.core.config import SEARCH_INTENT_RULE_MIN_CONFIDENCE
+from app.services.intent_rules import parse_search_intent
+
+# instruction -> (keyword, {condition: value}, accepted without the LLM)
+CASES = {
+    "laptop under $1,299": ("laptop", {"price_max": "1299$"}, True),
+    "phone under $1,299.50": ("phone", {"price_max": "1299.5$"}, True),
+    "shoes under 79,99 eur": ("shoes", {"price_max": "79.99€"}, True),
+    "tv under 1.299,99€": ("tv", {"price_max": "1299.99€"}, True),
+    "tv under 1.299€": ("tv", {"price_max": "1299€"}, False),
+    "laptop 16gb ram under 1500 euros": ("laptop", {"ram": "16GB", "price_max": "1500€"}, True),
+    "nike air max 90 under 120$": ("air max 90", {"brand": "nike", "price_max": "120$"}, True),
+}
+
+
+def main() -> int:
+    failures = 0
+    for instruction, (keyword, conditions, accepted) in CASES.items():
+        intent, confidence = parse_search_intent(instruction)
+        got = {c.name: c.value for c in intent.conditions}
+        ok = (
+            intent.keyword == keyword
+            and got == conditions
+            and (confidence >= SEARCH_INTENT_RULE_MIN_CONFIDENCE) == accepted
+        )
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {instruction!r}: {intent.keyword!r} {got} ({confidence:.2f})")
+    print(f"{len(CASES) - failures}/{len(CASES)} cases as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
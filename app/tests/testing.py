@@ -1,6 +1,6 @@
 import asyncio
 
-from app.strategies.classify_website import build_hybrid_classifier
+from app.strategies.classify_website import build_hybrid_classifier_async
 from app.strategies.ecommerce import run_ecommerce_flow
 
 
@@ -8,7 +8,7 @@ async def main():
     url = "https://www.ebay.com"
     instruction = "look for iphones 15"
 
-    site_type = await asyncio.to_thread(build_hybrid_classifier, url)
+    site_type = await build_hybrid_classifier_async(url)
     print(f"classifier -> {site_type}")
 
     if site_type != "ecommerce":
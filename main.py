@@ -2,12 +2,17 @@ import asyncio
 
 from app.core.logger import get_logger, setup_logging
 from app.pipeline.graph import build_agent_graph
+from app.services.chains.registry import warm_up
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_router import router_stats
+from app.services.llm_scheduler import get_scheduler
 
 logger = get_logger(__name__)
 
 
 def run_agent(url: str, instruction: str, log_level: str = "INFO") -> None:
     setup_logging(log_level=log_level.upper())
+    warm_up()
 
     graph = build_agent_graph()
     state = {
@@ -31,6 +36,12 @@ def run_agent(url: str, instruction: str, log_level: str = "INFO") -> None:
     for err in result.get("errors", []):
         logger.error("Error: %s", err)
 
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        logger.info("LLM cache stats: %s", llm_cache.stats())
+    logger.info("LLM scheduler stats: %s", get_scheduler().stats())
+    logger.info("LLM router stats: %s", router_stats())
+
 
 if __name__ == "__main__":
     URL = "https://www.amazon.com"